@@ -0,0 +1,969 @@
+import csv
+import resource
+import statistics
+import tempfile
+import time
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import click
+from flask import url_for
+from sqlalchemy import func, text
+from sqlalchemy_utils import database_exists, create_database
+
+from hotel_api.app import create_app
+from hotel_api.extensions import db, ephemeris, password_hasher
+from hotel_api.availability import search_flexible, search_hotels, with_distances
+from hotel_api.availability_index import AvailabilityIndex, np
+from hotel_api.ephemeris_precompute import compute_positions
+from hotel_api.hotel_import import HOTEL_COLUMNS, ROOM_COLUMNS, import_hotels
+from hotel_api.models import (
+    Hotels,
+    InventoryVersions,
+    Reservations,
+    Rooms,
+    RoomInventory,
+    Users,
+)
+from lib.astrd_data.astrd_data import astrd_data
+from lib.util_datetime import daterange, months_out
+from lib.util_streaming import NDJSON_MIMETYPE
+
+app = create_app(config_name="benchmark")
+db.app = app
+
+BENCH_EPHEM_DATA = astrd_data["1 Ceres"]["ephem_data"]
+
+SEED_HOTELS = (
+    "insert into hotel_api.hotels (name, established_date, proprietor, "
+    "astrd_diameter, astrd_surface_composition, ephem_data, "
+    "created_date, last_modified_date) "
+    "select 'bench_' || n, '1801-Jan-01', 'Bench, B.', 100.0, "
+    "(array['silicaceous', 'carbonaceous', 'enstatite', 'metallic', 'primitive'])"
+    "[1 + n % 5], :ephem_data, now(), now() "
+    "from generate_series(1, :hotels) as n; "
+)
+
+SEED_ROOMS = (
+    "insert into hotel_api.rooms (type, hotel_id, created_date, last_modified_date) "
+    "select rt.room_type, h.id, now(), now() "
+    "from hotel_api.hotels h "
+    "cross join (values ('double'), ('queen'), ('king')) as rt(room_type) "
+    "cross join generate_series(1, :rooms_per_type); "
+)
+
+SEED_INVENTORY = (
+    "insert into hotel_api.room_inventory (date, hotel_id, room_type, "
+    "max_rooms_available, rooms_reserved, created_date, last_modified_date) "
+    "select d, h.id, rt.room_type, :rooms_per_type, "
+    "case when random() < :booked_ratio then :rooms_per_type else 0 end, "
+    "now(), now() "
+    "from hotel_api.hotels h "
+    "cross join generate_series(cast(:start as date), "
+    "cast(:start as date) + (:days - 1) * interval '1 day', interval '1 day') as d "
+    "cross join (values ('double'), ('queen'), ('king')) as rt(room_type); "
+)
+
+SEED_USER = (
+    "insert into hotel_api.users (user_name, email, password, is_admin, "
+    "is_deactivated, created_date, last_modified_date) "
+    "values ('bench_user', 'bench_user@email.com', 'not a hash', false, false, "
+    "now(), now()) "
+    "on conflict do nothing; "
+)
+
+SEED_RESERVATIONS = (
+    "insert into hotel_api.reservations (checkin_date, checkout_date, "
+    "guest_full_name, customer_user_id, desired_room_type, hotel_id, "
+    "is_cancelled, is_completed, created_date, last_modified_date) "
+    "select current_date + n % 300, current_date + n % 300 + 3, "
+    "'Bench Guest ' || n, u.id, 'king', "
+    "1 + n % (select count(*) from hotel_api.hotels), false, false, now(), now() "
+    "from generate_series(1, :reservations) as n "
+    "cross join (select id from hotel_api.users where user_name = 'bench_user') u; "
+)
+
+# Reservations for one user with their nights reserved in inventory, released
+#  again when the user is deactivated
+SEED_USER_RESERVATIONS = (
+    "with seeded as ( "
+    "insert into hotel_api.reservations (checkin_date, checkout_date, "
+    "guest_full_name, customer_user_id, desired_room_type, hotel_id, "
+    "is_cancelled, is_completed, created_date, last_modified_date) "
+    "select current_date + 1 + n % 300, current_date + 4 + n % 300, "
+    "'Bench Guest ' || n, :user_id, 'king', "
+    "1 + n % (select count(*) from hotel_api.hotels), false, false, now(), now() "
+    "from generate_series(1, :reservations) as n "
+    "returning hotel_id, desired_room_type, checkin_date, checkout_date "
+    "), "
+    "nights as ( "
+    "select hotel_id, desired_room_type as room_type, night, count(*) as rooms "
+    "from seeded "
+    "cross join lateral generate_series(cast(checkin_date as timestamp), "
+    "cast(checkout_date as timestamp) - interval '1 day', "
+    "interval '1 day') as night "
+    "group by hotel_id, desired_room_type, night "
+    ") "
+    "update hotel_api.room_inventory i "
+    "set rooms_reserved = i.rooms_reserved + nights.rooms "
+    "from nights "
+    "where i.hotel_id = nights.hotel_id and i.room_type = nights.room_type "
+    "and i.date = nights.night; "
+)
+
+# Inventory search used by Availabilities.get before hotel_api.availability,
+#  kept here so the two can be compared on the same data.
+LEGACY_AVAILABILITY_CTE = (
+    "with hotel_dates as ( "
+    "select distinct hotel_id, date "
+    "from hotel_api.room_inventory "
+    "where date between :checkin and :lastnight "
+    "and (max_rooms_available - rooms_reserved) > 0 "
+    "and room_type in :room_types "
+    "), "
+    "hotel_day_count as ( "
+    "select distinct hotel_id, count(date) over(PARTITION BY hotel_id) as day_count "
+    "from hotel_dates "
+    "), "
+    "available_hotels as ( "
+    "select hotel_id "
+    "from hotel_day_count "
+    "where day_count = :day_count "
+    ") "
+    "select distinct hotel_id "
+    "from available_hotels left join hotel_api.hotels "
+    "on available_hotels.hotel_id = hotels.id; "
+)
+
+
+def _legacy_bulk_add_inventory(hotel_id, capacity, start_date, end_date):
+    """RoomInventory.bulk_add_inventory before it moved to generate_series."""
+    created_date = datetime.now()
+    room_inventory = []
+    for night in daterange(start_date, end_date):
+        for room_type, max_rooms in capacity.items():
+            room_inventory.append(
+                dict(
+                    created_date=created_date,
+                    last_modified_date=created_date,
+                    date=night,
+                    hotel_id=hotel_id,
+                    room_type=room_type,
+                    max_rooms_available=max_rooms,
+                    rooms_reserved=0,
+                )
+            )
+    db.engine.execute(RoomInventory.__table__.insert().values(room_inventory))
+
+
+def _timings(fn, repeat):
+    """Return wall clock timings in milliseconds for repeated calls of fn."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _rss_mb():
+    """Return the current resident set size of this process in megabytes."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+def _report(label, timings):
+    """Echo median and p95 for a list of timings in milliseconds."""
+    timings = sorted(timings)
+    p95 = timings[max(0, int(round(len(timings) * 0.95)) - 1)]
+    click.echo(
+        f"{label:<28} median {statistics.median(timings):10.2f} ms"
+        f"   p95 {p95:10.2f} ms   n={len(timings)}"
+    )
+
+
+@click.group()
+def cli():
+    """ Run performance benchmarks against the benchmark database. """
+    pass
+
+
+@click.command()
+@click.option("--hotels", default=10000, help="Number of hotels to seed.")
+@click.option("--days", default=365, help="Days of inventory per hotel.")
+@click.option("--rooms-per-type", default=10, help="Rooms of each type per hotel.")
+@click.option(
+    "--booked-ratio", default=0.05, help="Share of inventory nights fully booked."
+)
+def init(hotels, days, rooms_per_type, booked_ratio):
+    """
+    Create and seed the benchmark database.
+
+    :param hotels: Number of hotels to seed
+    :param days: Days of inventory per hotel, starting today
+    :param rooms_per_type: Rooms of each type per hotel
+    :param booked_ratio: Share of inventory nights that are fully booked
+    :return: None
+    """
+    db_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    if not database_exists(db_uri):
+        create_database(db_uri)
+
+    db.engine.execute("CREATE SCHEMA IF NOT EXISTS hotel_api;")
+    db.drop_all()
+    db.create_all()
+
+    start = time.perf_counter()
+    db.engine.execute(text(SEED_HOTELS), ephem_data=BENCH_EPHEM_DATA, hotels=hotels)
+    db.engine.execute(text(SEED_ROOMS), rooms_per_type=rooms_per_type)
+    db.engine.execute(
+        text(SEED_INVENTORY),
+        rooms_per_type=rooms_per_type,
+        booked_ratio=booked_ratio,
+        start=date.today().isoformat(),
+        days=days,
+    )
+    db.engine.execute("ANALYZE;")
+    click.echo(
+        f"Seeded {hotels} hotels x {days} days in "
+        f"{time.perf_counter() - start:.1f} s"
+    )
+
+    return None
+
+
+@click.command()
+@click.option("--nights", default=5, help="Length of each searched stay.")
+@click.option("--repeat", default=20, help="Searches per implementation.")
+@click.option(
+    "--room-type", multiple=True, default=("king",), help="Room types to search."
+)
+def availability(nights, repeat, room_type):
+    """
+    Compare the legacy inventory CTE with hotel_api.availability.
+
+    :param nights: Length of each searched stay
+    :param repeat: Number of searches per implementation
+    :param room_type: Room types to search
+    :return: None
+    """
+    checkin = date.today() + timedelta(days=30)
+    checkout = checkin + timedelta(days=nights)
+
+    def legacy():
+        avail_hotels = db.engine.execute(
+            text(LEGACY_AVAILABILITY_CTE),
+            checkin=checkin.isoformat(),
+            lastnight=(checkout - timedelta(days=1)).isoformat(),
+            room_types=tuple(room_type),
+            day_count=nights,
+        ).fetchall()
+        avail_hotels = [v[0] for v in avail_hotels]
+        hotels = db.session.query(Hotels).filter(Hotels.id.in_(avail_hotels)).all()
+        db.session.rollback()
+        return hotels
+
+    def grouped():
+        hotels = search_hotels(checkin, checkout, room_types=room_type).all()
+        db.session.rollback()
+        return hotels
+
+    legacy_ids = {hotel.id for hotel in legacy()}
+    grouped_ids = {hotel.id for hotel in grouped()}
+    if legacy_ids != grouped_ids:
+        raise click.ClickException("Search implementations returned different hotels.")
+    click.echo(f"{len(grouped_ids)} hotels available for {nights} nights")
+
+    _report("legacy cte + in_()", _timings(legacy, repeat))
+    _report("grouped aggregate", _timings(grouped, repeat))
+
+    return None
+
+
+@click.command()
+@click.option("--reservations", default=1000000, help="Reservations to export.")
+@click.option("--sample-every", default=100000, help="Rows between RSS samples.")
+def export(reservations, sample_every):
+    """
+    Stream every reservation as NDJSON and sample RSS along the way.
+
+    :param reservations: Number of reservations to seed and export
+    :param sample_every: Rows between resident set size samples
+    :return: None
+    """
+    seeded = db.session.query(Reservations.id).count()
+    if seeded < reservations:
+        db.engine.execute(SEED_USER)
+        db.engine.execute(
+            text(SEED_RESERVATIONS), reservations=reservations - seeded
+        )
+    db.session.rollback()
+
+    with app.test_request_context():
+        url = url_for("api.reservations")
+
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.get(url, headers={"Accept": NDJSON_MIMETYPE}, buffered=False)
+    click.echo(f"{'rows':>10} {'rss MB':>10} {'seconds':>10}")
+    click.echo(f"{0:>10} {_rss_mb():>10.1f} {0:>10.1f}")
+
+    rows = 0
+    for chunk in response.response:
+        rows += chunk.count(b"\n")
+        if rows // sample_every != (rows - chunk.count(b"\n")) // sample_every:
+            elapsed = time.perf_counter() - start
+            click.echo(f"{rows:>10} {_rss_mb():>10.1f} {elapsed:>10.1f}")
+    response.close()
+
+    elapsed = time.perf_counter() - start
+    click.echo(f"Exported {rows} reservations in {elapsed:.1f} s")
+
+    return None
+
+
+@click.command()
+@click.option(
+    "--rounds", multiple=True, default=(4, 8, 10, 12), help="bcrypt costs to try."
+)
+@click.option("--logins", default=64, help="Password checks per cost.")
+@click.option("--concurrency", default=8, help="Simultaneous logins.")
+def login(rounds, logins, concurrency):
+    """
+    Measure password check throughput at several bcrypt costs.
+
+    :param rounds: bcrypt cost factors to try
+    :param logins: Password checks per cost factor
+    :param concurrency: Number of simultaneous logins
+    :return: None
+    """
+    log_rounds = password_hasher.log_rounds
+    queue_timeout = password_hasher.queue_timeout
+    # Logins beyond the pool size wait for a slot rather than fail
+    password_hasher.queue_timeout = None
+    click.echo(
+        f"pool size {app.config['BCRYPT_POOL_SIZE']}, concurrency {concurrency}"
+    )
+    try:
+        for cost in rounds:
+            password_hasher.log_rounds = cost
+            pw_hash = password_hasher.generate_password_hash("benchpassword")
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(
+                    executor.map(
+                        lambda _: password_hasher.check_password_hash(
+                            pw_hash, "benchpassword"
+                        ),
+                        range(logins),
+                    )
+                )
+            elapsed = time.perf_counter() - start
+            click.echo(
+                f"cost {cost:>2}   {logins / elapsed:10.1f} logins/s"
+                f"   {elapsed / logins * 1000:10.2f} ms/login"
+            )
+    finally:
+        password_hasher.log_rounds = log_rounds
+        password_hasher.queue_timeout = queue_timeout
+
+    return None
+
+
+@click.command()
+@click.option("--hotels", default=10000, help="Hotels to generate inventory for.")
+@click.option("--months", default=24, help="Months of inventory per hotel.")
+@click.option(
+    "--legacy-hotels", default=100, help="Hotels to run the old implementation on."
+)
+def inventory(hotels, months, legacy_hotels):
+    """
+    Time generating a fresh inventory horizon for every benchmark hotel.
+
+    Inventory is written after the last night already seeded and deleted
+    again afterwards, so the benchmark database is left as it was.
+
+    :param hotels: Number of hotels to generate inventory for
+    :param months: Months of inventory per hotel
+    :param legacy_hotels: Hotels to run the old dict building implementation on
+    :return: None
+    """
+    hotel_ids = [
+        row.id
+        for row in db.session.query(Hotels.id).order_by(Hotels.id).limit(hotels)
+    ]
+    last_night = db.session.query(func.max(RoomInventory.date)).scalar()
+    db.session.rollback()
+    start_date = (last_night or date.today()) + timedelta(days=1)
+    end_date = months_out(start_date, months)
+    capacity = {"double": 10, "queen": 10, "king": 10}
+    nights = (end_date - start_date).days
+    click.echo(
+        f"{len(hotel_ids)} hotels x {nights} nights "
+        f"({len(hotel_ids) * nights * len(capacity)} rows)"
+    )
+
+    def cleanup():
+        db.engine.execute(
+            RoomInventory.__table__.delete().where(
+                RoomInventory.date >= start_date
+            )
+        )
+
+    def legacy(hotel_id):
+        _legacy_bulk_add_inventory(hotel_id, capacity, start_date, end_date)
+
+    def generated(hotel_id):
+        RoomInventory.bulk_add_inventory(
+            hotel_id=hotel_id,
+            max_double_capactiy=capacity["double"],
+            max_queen_capactiy=capacity["queen"],
+            max_king_capacity=capacity["king"],
+            start_date=start_date,
+            end_date=end_date,
+        )
+        db.session.commit()
+
+    try:
+        with app.app_context():
+            for label, fn, ids in (
+                ("dicts + VALUES", legacy, hotel_ids[:legacy_hotels]),
+                ("generate_series", generated, hotel_ids),
+            ):
+                rss_before = _rss_mb()
+                timings = []
+                for hotel_id in ids:
+                    timings += _timings(lambda: fn(hotel_id), 1)
+                _report(f"{label} per hotel", timings)
+                click.echo(
+                    f"{'':<28} {len(ids)} hotels in {sum(timings) / 1000:.1f} s"
+                    f", rss +{_rss_mb() - rss_before:.1f} MB"
+                )
+                cleanup()
+    finally:
+        db.session.rollback()
+        cleanup()
+
+    return None
+
+
+@click.command()
+@click.option("--days", default=30, help="Nights trimmed from every hotel first.")
+@click.option("--batch-size", default=1000, help="Hotels extended per transaction.")
+def horizon(days, batch_size):
+    """
+    Time extending every benchmark hotel's inventory horizon.
+
+    The last nights of every hotel are deleted and then appended again, so
+    the benchmark database is left as it was.
+
+    :param days: Nights trimmed from the end of every hotel's inventory
+    :param batch_size: Hotels extended per transaction
+    :return: None
+    """
+    last_night = db.session.query(func.max(RoomInventory.date)).scalar()
+    db.session.rollback()
+    end_date = last_night + timedelta(days=1)
+    db.engine.execute(
+        RoomInventory.__table__.delete().where(
+            RoomInventory.date > last_night - timedelta(days=days)
+        )
+    )
+
+    with app.app_context():
+        start = time.perf_counter()
+        added = RoomInventory.extend_horizon(end_date=end_date, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        click.echo(f"Added {added} inventory nights in {elapsed:.2f} s")
+
+        start = time.perf_counter()
+        added = RoomInventory.extend_horizon(end_date=end_date, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        click.echo(f"Re-run added {added} inventory nights in {elapsed:.2f} s")
+
+    return None
+
+
+@click.command()
+@click.option("--rooms", default=2000, help="Rooms per created hotel.")
+@click.option("--repeat", default=10, help="Hotels created per implementation.")
+def rooms(rooms, repeat):
+    """
+    Compare creating a large hotel's rooms through the ORM and in bulk.
+
+    Every hotel is created in a transaction that is rolled back afterwards.
+
+    :param rooms: Rooms per created hotel, split evenly across room types
+    :param repeat: Hotels created per implementation
+    :return: None
+    """
+    per_type = rooms // 3
+
+    def new_hotel():
+        hotel = Hotels(
+            name="bench_rooms",
+            ephem_data=BENCH_EPHEM_DATA,
+            established_date="1801-Jan-01",
+            proprietor="Bench, B.",
+            astrd_diameter=100.0,
+            astrd_surface_composition="metallic",
+            created_date=datetime.now(),
+            last_modified_date=datetime.now(),
+        )
+        db.session.add(hotel)
+        db.session.flush()
+        return hotel
+
+    def orm():
+        hotel = new_hotel()
+        db.session.add_all(
+            [
+                Rooms(
+                    type=room_type,
+                    hotel_id=hotel.id,
+                    created_date=datetime.now(),
+                    last_modified_date=datetime.now(),
+                )
+                for room_type in ("double", "queen", "king")
+                for _ in range(per_type)
+            ]
+        )
+        db.session.flush()
+        db.session.rollback()
+
+    def bulk():
+        hotel = new_hotel()
+        Rooms.bulk_add_rooms(
+            hotel_id=hotel.id,
+            double_rooms=per_type,
+            queen_rooms=per_type,
+            king_rooms=per_type,
+        )
+        db.session.rollback()
+
+    click.echo(f"{per_type * 3} rooms per hotel")
+    _report("orm objects + flush", _timings(orm, repeat))
+    _report("bulk_add_rooms", _timings(bulk, repeat))
+
+    return None
+
+
+@click.command()
+@click.option("--reservations", default=1000, help="Open reservations of the user.")
+def deactivate(reservations):
+    """
+    Compare deactivating a user reservation by reservation and set-based.
+
+    Each run seeds a fresh user holding the given number of open reservations
+    and removes the user and reservations afterwards. Released inventory is
+    back to what it was before seeding.
+
+    :param reservations: Open reservations held by the deactivated user
+    :return: None
+    """
+
+    def seed(user_name):
+        user = Users(
+            user_name=user_name, email=f"{user_name}@email.com", password="bench"
+        )
+        user.add()
+        db.session.execute(
+            text(SEED_USER_RESERVATIONS),
+            {"user_id": user.id, "reservations": reservations},
+        )
+        db.session.commit()
+        return user
+
+    def cleanup(user):
+        user_id = user.id
+        db.session.rollback()
+        db.session.query(Reservations).filter(
+            Reservations.customer_user_id == user_id
+        ).delete(synchronize_session=False)
+        db.session.query(Users).filter(Users.id == user_id).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+
+    def per_reservation(user):
+        # Users.delete before it was set-based
+        user.is_deactivated = True
+        for reservation in user.reservations:
+            if not reservation.is_cancelled:
+                reservation.delete()
+        user.last_modified_date = datetime.now()
+        db.session.commit()
+
+    with app.test_request_context():
+        for label, fn in (
+            ("per reservation", per_reservation),
+            ("set-based", lambda user: user.delete()),
+        ):
+            user = seed("bench_deactivate")
+            try:
+                timings = _timings(lambda: fn(user), 1)
+            finally:
+                cleanup(user)
+            _report(f"{label} ({reservations})", timings)
+
+    return None
+
+
+@click.command()
+@click.option("--nights", default=5, help="Length of each searched stay.")
+@click.option("--repeat", default=100, help="Searches per implementation.")
+@click.option(
+    "--room-type", multiple=True, default=("king",), help="Room types to search."
+)
+@click.option("--changed", default=100, help="Hotels changed before a refresh.")
+def index(nights, repeat, room_type, changed):
+    """
+    Compare the SQL availability search with the in-memory availability index.
+
+    Requires numpy. Reports the time to load the index, the size of its
+    array and the time of an incremental refresh after bumping the inventory
+    version of some hotels.
+
+    :param nights: Length of each searched stay
+    :param repeat: Number of searches per implementation
+    :param room_type: Room types to search
+    :param changed: Hotels whose inventory version is bumped before a refresh
+    :return: None
+    """
+    if np is None:
+        raise click.ClickException("The availability index requires numpy.")
+    checkin = date.today() + timedelta(days=30)
+    checkout = checkin + timedelta(days=nights)
+    search_index = AvailabilityIndex(app)
+
+    start = time.perf_counter()
+    search_index.load()
+    click.echo(
+        f"Loaded {search_index.stats()['hotels']} hotels x {search_index.days} days "
+        f"({search_index.stats()['megabytes']} MB) in "
+        f"{time.perf_counter() - start:.1f} s"
+    )
+
+    hotel_ids = [id for id, in db.session.query(Hotels.id).limit(changed)]
+    InventoryVersions.bump(hotel_ids)
+    db.session.commit()
+    start = time.perf_counter()
+    search_index.refresh()
+    click.echo(
+        f"Refreshed {len(hotel_ids)} changed hotels in "
+        f"{(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    # Keep refreshes out of the search timings
+    search_index.refresh_seconds = float("inf")
+
+    def sql():
+        hotels = search_hotels(checkin, checkout, room_types=room_type).all()
+        db.session.rollback()
+        return hotels
+
+    def indexed():
+        return search_index.search(checkin, checkout, room_types=room_type)
+
+    sql_ids = {hotel.id for hotel in sql()}
+    index_ids = {hotel["id"] for hotel in indexed()}
+    if sql_ids != index_ids:
+        raise click.ClickException("Search implementations returned different hotels.")
+    click.echo(f"{len(index_ids)} hotels available for {nights} nights")
+
+    _report("grouped aggregate", _timings(sql, repeat))
+    _report("numpy index", _timings(indexed, repeat))
+
+    return None
+
+
+@click.command()
+@click.option("--window-days", default=31, help="Length of the searched window.")
+@click.option("--nights", default=4, help="Length of each searched stay.")
+@click.option("--repeat", default=5, help="Searches per implementation.")
+@click.option(
+    "--room-type", multiple=True, default=("king",), help="Room types to search."
+)
+def flexible(window_days, nights, repeat, room_type):
+    """
+    Compare one search per check-in date with a single flexible date search.
+
+    :param window_days: Length of the window stays have to fit in
+    :param nights: Length of each searched stay
+    :param repeat: Number of searches per implementation
+    :param room_type: Room types to search
+    :return: None
+    """
+    window_start = date.today() + timedelta(days=30)
+    window_end = window_start + timedelta(days=window_days)
+
+    def per_checkin():
+        checkins = {}
+        last_checkin = window_end - timedelta(days=nights)
+        for checkin in daterange(window_start, last_checkin + timedelta(days=1)):
+            checkout = checkin + timedelta(days=nights)
+            for hotel in search_hotels(checkin, checkout, room_types=room_type):
+                checkins.setdefault(hotel.id, []).append(checkin)
+        db.session.rollback()
+        return checkins
+
+    def windowed():
+        hotels = search_flexible(window_start, window_end, nights, room_types=room_type)
+        db.session.rollback()
+        return {hotel["id"]: hotel["checkin_dates"] for hotel in hotels}
+
+    if per_checkin() != windowed():
+        raise click.ClickException("Search implementations returned different dates.")
+    click.echo(f"{window_days} day window, {nights} night stays")
+
+    _report("one search per check-in", _timings(per_checkin, repeat))
+    _report("window functions", _timings(windowed, repeat))
+
+    return None
+
+
+@click.command()
+@click.option("--stays", default=50, help="Stays per batch.")
+@click.option("--repeat", default=5, help="Batches per implementation.")
+def batch(stays, repeat):
+    """
+    Compare adding a batch of stays one reservation at a time and with
+    Reservations.add_batch.
+
+    Each run books for a fresh user whose reservations are cancelled,
+    releasing their inventory, and removed afterwards.
+
+    :param stays: Stays per batch, each for another hotel
+    :param repeat: Batches per implementation
+    :return: None
+    """
+    hotel_ids = [id for id, in db.session.query(Hotels.id).order_by(Hotels.id)]
+    db.session.rollback()
+    if len(hotel_ids) < stays:
+        raise click.ClickException(f"Need at least {stays} hotels.")
+    checkin = date.today() + timedelta(days=60)
+
+    def batch_stays(user_id, run):
+        first_night = checkin + timedelta(days=run * 3)
+        return [
+            dict(
+                checkin_date=first_night,
+                checkout_date=first_night + timedelta(days=3),
+                guest_full_name=f"Batch Guest {n}",
+                customer_user_id=user_id,
+                desired_room_type="queen",
+                hotel_id=hotel_id,
+            )
+            for n, hotel_id in enumerate(hotel_ids[:stays])
+        ]
+
+    def per_reservation(user_id, run):
+        for stay in batch_stays(user_id, run):
+            Reservations(
+                **stay,
+                is_cancelled=False,
+                is_completed=False,
+                created_date=datetime.now(),
+                last_modified_date=datetime.now(),
+            ).add()
+
+    def set_based(user_id, run):
+        fits, _ = Reservations.add_batch(batch_stays(user_id, run))
+        if not all(fits):
+            raise click.ClickException("Benchmark hotels are booked out.")
+
+    with app.test_request_context():
+        for label, fn in (
+            ("per reservation", per_reservation),
+            ("add_batch", set_based),
+        ):
+            user = Users(
+                user_name="bench_batch", email="bench_batch@email.com", password="bench"
+            )
+            user.add()
+            user_id = user.id
+            timings = []
+            try:
+                for run in range(repeat):
+                    timings.extend(_timings(lambda: fn(user_id, run), 1))
+            finally:
+                db.session.rollback()
+                user.delete()
+                db.session.query(Reservations).filter(
+                    Reservations.customer_user_id == user_id
+                ).delete(synchronize_session=False)
+                db.session.query(Users).filter(Users.id == user_id).delete(
+                    synchronize_session=False
+                )
+                db.session.commit()
+            _report(f"{label} ({stays})", timings)
+            click.echo(
+                f"{'':<28} {stays * 1000 / statistics.median(timings):10.0f} "
+                f"reservations/s"
+            )
+
+    return None
+
+
+@click.command("import")
+@click.option("--hotels", default=50000, help="Hotels in the imported file.")
+@click.option("--months", default=12, help="Months of inventory per hotel.")
+@click.option("--chunk-size", default=1000, help="Hotels per COPY and commit.")
+def import_(hotels, months, chunk_size):
+    """
+    Time importing a generated CSV file of hotels.
+
+    The imported hotels are deleted again afterwards, along with their rooms
+    and inventory.
+
+    :param hotels: Hotels in the imported file
+    :param months: Months of inventory per hotel
+    :param chunk_size: Hotels per COPY and commit
+    :return: None
+    """
+    with tempfile.TemporaryFile("w+", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HOTEL_COLUMNS + ROOM_COLUMNS)
+        for n in range(hotels):
+            writer.writerow(
+                (f"bench_import_{n}", "1801-Jan-01", "Bench, B.", 100.0, "metallic")
+                + (BENCH_EPHEM_DATA, 10, 10, 10)
+            )
+        f.seek(0)
+
+        with app.app_context():
+            start = time.perf_counter()
+            peak = _rss_mb()
+
+            def progress(stats):
+                nonlocal peak
+                peak = max(peak, _rss_mb())
+
+            try:
+                stats = import_hotels(
+                    f,
+                    "csv",
+                    chunk_size=chunk_size,
+                    inv_months=months,
+                    progress=progress,
+                )
+                elapsed = time.perf_counter() - start
+            finally:
+                db.session.rollback()
+                db.session.query(Hotels).filter(
+                    Hotels.name.like("bench\\_import\\_%")
+                ).delete(synchronize_session=False)
+                db.session.commit()
+
+    click.echo(
+        f"Imported {stats['imported']} hotels in {elapsed:.1f} s "
+        f"({stats['imported'] / elapsed:.0f} hotels/s, peak RSS {peak:.0f} MB)"
+    )
+
+    return None
+
+
+@click.command()
+@click.option("--hotels", default=3000, help="Hotels sorted by distance.")
+@click.option("--repeat", default=20, help="Sorts per cache state.")
+def distance(hotels, repeat):
+    """
+    Time sorting search results by Earth distance with cold and warm caches.
+
+    Seeded benchmark hotels all share one ephem_data line, so the sorted
+    hotels are generated, each with the orbit of a real asteroid in turn.
+
+    :param hotels: Hotels sorted by distance
+    :param repeat: Sorts per cache state
+    :return: None
+    """
+    orbits = [astrd["ephem_data"].split(",", 1)[1] for astrd in astrd_data.values()]
+    results = [
+        dict(id=n, ephem_data=f"{n} Bench,{orbits[n % len(orbits)]}")
+        for n in range(hotels)
+    ]
+    day = date.today()
+
+    def cold():
+        ephemeris.clear()
+        return with_distances(results, day, sort_by_distance=True)
+
+    def warm():
+        return with_distances(results, day, sort_by_distance=True)
+
+    click.echo(f"{len(results)} hotels")
+    _report("cold caches", _timings(cold, repeat))
+    warm()
+    _report("memoized distances", _timings(warm, repeat))
+
+    return None
+
+
+@click.command("ephemeris")
+@click.option("--hotels", default=500, help="Hotels computed per run.")
+@click.option("--days", default=365, help="Daily positions per hotel.")
+@click.option(
+    "--chunk-size",
+    default=app.config["EPHEMERIS_PRECOMPUTE_CHUNK_SIZE"],
+    help="Hotels per worker task.",
+)
+def ephemeris_(hotels, days, chunk_size):
+    """
+    Time computing daily positions with 1, 2, 4... up to one worker per CPU.
+
+    Only computing is timed, including starting the pool, so the speedup
+    shows how precomputing scales across cores without the database.
+
+    :param hotels: Hotels computed per run
+    :param days: Daily positions per hotel
+    :param chunk_size: Hotels per worker task
+    :return: None
+    """
+    orbits = [astrd["ephem_data"].split(",", 1)[1] for astrd in astrd_data.values()]
+    tasks = [
+        (n, f"{n} Bench,{orbits[n % len(orbits)]}", date.today(), days)
+        for n in range(hotels)
+    ]
+    chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+
+    click.echo(f"{hotels} hotels x {days} days, {len(chunks)} chunks, {cpus} CPUs")
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = sum(
+                positions.count("\n")
+                for positions in pool.map(compute_positions, chunks)
+            )
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        click.echo(
+            f"{workers:>3} workers: {elapsed:.2f} s, {hotels / elapsed:.0f} hotels/s, "
+            f"{rows / elapsed:.0f} rows/s, speedup {baseline / elapsed:.1f}x"
+        )
+
+    return None
+
+
+cli.add_command(init)
+cli.add_command(availability)
+cli.add_command(export)
+cli.add_command(login)
+cli.add_command(inventory)
+cli.add_command(horizon)
+cli.add_command(rooms)
+cli.add_command(deactivate)
+cli.add_command(index)
+cli.add_command(flexible)
+cli.add_command(batch)
+cli.add_command(import_)
+cli.add_command(distance)
+cli.add_command(ephemeris_)
@@ -4,6 +4,7 @@ from sqlalchemy_utils import database_exists, create_database
 
 from hotel_api.app import create_app
 from hotel_api.extensions import db
+from hotel_api.migrations import run_migrations
 from hotel_api.models import Hotels, Reservations
 from lib.seed_data.seed_data import get_hotels, reservations, seed_db
 
@@ -57,6 +58,19 @@ def seed(dev):
     return None
 
 
+@click.command()
+def migrate():
+    """
+    Upgrade an existing database to the current schema.
+
+    :return: None
+    """
+    for name in run_migrations():
+        click.echo(f"Applied {name}")
+
+    return None
+
+
 @click.command()
 @click.option(
     "--with-testdb/ --no-with-testdb", default=False, help="Create a test db too?"
@@ -79,4 +93,5 @@ def reset(ctx, with_testdb, dev):
 
 cli.add_command(init)
 cli.add_command(seed)
+cli.add_command(migrate)
 cli.add_command(reset)
\ No newline at end of file
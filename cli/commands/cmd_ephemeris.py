@@ -0,0 +1,70 @@
+import time
+
+import click
+
+from hotel_api.app import create_app
+from hotel_api.extensions import db
+from hotel_api.ephemeris_precompute import precompute_positions
+
+app = create_app()
+db.app = app
+
+
+@click.group()
+def cli():
+    """ Precompute asteroid positions. """
+    pass
+
+
+@click.command()
+@click.option(
+    "--months",
+    default=app.config["INVENTORY_HORIZON_MONTHS"],
+    help="Months of daily positions from today.",
+)
+@click.option(
+    "--workers",
+    default=None,
+    type=int,
+    help="Worker processes, one per CPU by default.",
+)
+@click.option(
+    "--chunk-size",
+    default=app.config["EPHEMERIS_PRECOMPUTE_CHUNK_SIZE"],
+    help="Hotels per worker task and commit.",
+)
+def precompute(months, workers, chunk_size):
+    """
+    Compute the daily position of every hotel's asteroid into hotel_ephemeris.
+
+    Only hotels missing days or whose ephem_data changed are computed, so it
+    can be run daily to move the positions forward with the horizon.
+
+    :param months: Months of daily positions from today
+    :param workers: Worker processes
+    :param chunk_size: Hotels per worker task and commit
+    :return: None
+    """
+    start = time.perf_counter()
+
+    def progress(stats):
+        click.echo(
+            f"{stats['computed']}/{stats['stale']} hotels, {stats['rows']} rows "
+            f"({time.perf_counter() - start:.1f} s)"
+        )
+
+    with app.app_context():
+        stats = precompute_positions(
+            months=months, workers=workers, chunk_size=chunk_size, progress=progress
+        )
+    elapsed = time.perf_counter() - start
+    click.echo(
+        f"Computed {stats['computed']} hotels ({stats['changed']} changed), "
+        f"{stats['rows']} rows in {elapsed:.1f} s "
+        f"({stats['computed'] / elapsed:.0f} hotels/s)"
+    )
+
+    return None
+
+
+cli.add_command(precompute)
@@ -0,0 +1,77 @@
+import time
+
+import click
+
+from hotel_api.app import create_app
+from hotel_api.extensions import db
+from hotel_api.hotel_import import FORMATS, import_hotels
+
+app = create_app()
+db.app = app
+
+
+@click.group()
+def cli():
+    """ Manage hotels in bulk. """
+    pass
+
+
+@click.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(FORMATS),
+    default=None,
+    help="File format, guessed from the file extension by default.",
+)
+@click.option(
+    "--chunk-size",
+    default=app.config["HOTEL_IMPORT_CHUNK_SIZE"],
+    help="Hotels per COPY and commit.",
+)
+@click.option(
+    "--months",
+    default=app.config["INVENTORY_HORIZON_MONTHS"],
+    help="Months of inventory from today for every imported hotel.",
+)
+def import_(path, format_, chunk_size, months):
+    """
+    Import hotels with their room counts from a CSV or JSONL file.
+
+    :param path: CSV file with a header row, or JSONL file
+    :param format_: csv or jsonl
+    :param chunk_size: Hotels per COPY and commit
+    :param months: Months of inventory from today for every imported hotel
+    :return: None
+    """
+    format_ = format_ or path.rsplit(".", 1)[-1].lower()
+    if format_ not in FORMATS:
+        raise click.BadParameter(f"Cannot guess the format of {path}.")
+    start = time.perf_counter()
+
+    def progress(stats):
+        click.echo(
+            f"{stats['read']} read, {stats['imported']} imported, "
+            f"{stats['skipped']} existing, {stats['invalid']} invalid "
+            f"({time.perf_counter() - start:.1f} s)"
+        )
+
+    with app.app_context(), open(path, newline="", encoding="utf-8") as lines:
+        stats = import_hotels(
+            lines,
+            format_,
+            chunk_size=chunk_size,
+            inv_months=months,
+            progress=progress,
+        )
+    for error in stats["errors"]:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    click.echo(
+        f"Imported {stats['imported']} hotels in {time.perf_counter() - start:.1f} s"
+    )
+
+    return None
+
+
+cli.add_command(import_)
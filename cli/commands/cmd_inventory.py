@@ -0,0 +1,43 @@
+from datetime import date
+
+import click
+
+from hotel_api.app import create_app
+from hotel_api.extensions import db
+from hotel_api.models import RoomInventory
+from lib.util_datetime import months_out
+
+app = create_app()
+db.app = app
+
+
+@click.group()
+def cli():
+    """ Maintain hotel room inventory. """
+    pass
+
+
+@click.command()
+@click.option(
+    "--months",
+    default=app.config["INVENTORY_HORIZON_MONTHS"],
+    help="Months from today every hotel should be bookable.",
+)
+@click.option("--batch-size", default=1000, help="Hotels extended per transaction.")
+def extend(months, batch_size):
+    """
+    Extend every hotel's inventory to the rolling horizon.
+
+    :param months: Months from today every hotel should be bookable
+    :param batch_size: Hotels extended per transaction
+    :return: None
+    """
+    end_date = months_out(date.today(), months)
+    with app.app_context():
+        added = RoomInventory.extend_horizon(end_date=end_date, batch_size=batch_size)
+    click.echo(f"Added {added} inventory nights up to {end_date.isoformat()}")
+
+    return None
+
+
+cli.add_command(extend)
@@ -0,0 +1,33 @@
+import click
+
+from hotel_api.app import create_app
+from hotel_api.extensions import db
+from hotel_api.models import BlacklistedTokens
+
+app = create_app()
+db.app = app
+
+
+@click.group()
+def cli():
+    """ Manage blacklisted access tokens. """
+    pass
+
+
+@click.command()
+@click.option("--batch-size", default=1000, help="Rows deleted per transaction.")
+def purge(batch_size):
+    """
+    Delete expired tokens from the blacklist.
+
+    :param batch_size: Rows deleted per transaction
+    :return: None
+    """
+    with app.app_context():
+        purged = BlacklistedTokens.purge_expired(batch_size=batch_size)
+    click.echo(f"Purged {purged} expired tokens")
+
+    return None
+
+
+cli.add_command(purge)
@@ -0,0 +1,38 @@
+"""
+gunicorn settings, loaded with ``gunicorn -c python:config.gunicorn``.
+
+Each worker opens its own connection pool, so Postgres sees up to
+workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections from one host.
+
+With GUNICORN_THREADS > 1 workers are gthread workers, which keep serving
+other requests while a thread waits on bcrypt or the database. Keep
+DB_POOL_SIZE + DB_MAX_OVERFLOW at or above the thread count.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "false").lower() == "true"
+accesslog = "-"
+
+
+def pre_fork(server, worker):
+    """
+    Close the master's pooled connections before forking a worker.
+
+    With preload_app the app, and possibly its engine, is created in the
+    master. A forked worker would inherit the master's open sockets and two
+    processes would then talk over the same connection.
+    """
+    if not server.cfg.preload_app:
+        return None
+
+    from hotel_api.extensions import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose()
+        db.router.dispose()
+
+    return None
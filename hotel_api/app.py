@@ -3,7 +3,17 @@ import os
 from flask import Flask
 
 from config.settings import config
-from hotel_api.extensions import api, db, bcrypt
+from hotel_api.extensions import (
+    api,
+    availability_cache,
+    availability_index,
+    db,
+    ephemeris,
+    bcrypt,
+    password_hasher,
+    token_cache,
+    token_blacklist,
+)
 
 
 def create_app(config_name="development"):
@@ -26,6 +36,7 @@ def create_app(config_name="development"):
     from hotel_api.resources.reservations import reservations_ns
     from hotel_api.resources.hotels import hotels_ns
     from hotel_api.resources.availabilities import availabilities_ns
+    from hotel_api.resources.health import health_ns
 
     # Register namespaces for resources available through the api
     api.add_namespace(users_ns, path="/users")
@@ -33,6 +44,7 @@ def create_app(config_name="development"):
     api.add_namespace(hotels_ns, path="/hotels")
     api.add_namespace(availabilities_ns, path="/availabilities")
     api.add_namespace(reservations_ns, path="/reservations")
+    api.add_namespace(health_ns, path="/health")
 
     from hotel_api.extensions import api_bp
 
@@ -40,6 +52,10 @@ def create_app(config_name="development"):
 
     extensions(app)
 
+    from hotel_api.jobs import start_jobs
+
+    start_jobs(app)
+
     return app
 
 
@@ -52,5 +68,11 @@ def extensions(app):
     """
     db.init_app(app)
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
+    token_cache.init_app(app)
+    token_blacklist.init_app(app)
+    availability_cache.init_app(app)
+    availability_index.init_app(app)
+    ephemeris.init_app(app)
 
     return None
\ No newline at end of file
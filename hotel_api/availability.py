@@ -0,0 +1,232 @@
+from datetime import timedelta
+
+from sqlalchemy import func, distinct, text
+
+from hotel_api.extensions import db, availability_cache, availability_index, ephemeris
+from hotel_api.models import Hotels, HotelEphemeris, RoomInventory, InventoryVersions
+from hotel_api.routing import read_only
+from lib.util_sqlalchemy import row2dict
+
+ROOM_TYPES = ("double", "queen", "king")
+
+# Free nights are numbered per hotel in date order. Consecutive free nights
+#  share night - row_number, so each run of free nights is one group and a
+#  check-in is feasible when its run lasts at least the length of the stay.
+FLEXIBLE_CHECKINS = read_only(
+    text(
+        "with free_nights as ( "
+        "select distinct ri.hotel_id, cast(ri.date as date) as night "
+        "from hotel_api.room_inventory ri "
+        "join hotel_api.hotels h on h.id = ri.hotel_id "
+        "where ri.date >= :window_start and ri.date < :window_end "
+        "and ri.room_type = any(cast(:room_types as text[])) "
+        "and ri.max_rooms_available - ri.rooms_reserved > 0 "
+        "and (cast(:names as text[]) is null or h.name = any(cast(:names as text[]))) "
+        "and (cast(:surface_types as text[]) is null "
+        "or h.astrd_surface_composition = any(cast(:surface_types as text[]))) "
+        "), runs as ( "
+        "select hotel_id, night, night - cast(row_number() over "
+        "(partition by hotel_id order by night) as integer) as run "
+        "from free_nights "
+        "), run_ends as ( "
+        "select hotel_id, night, "
+        "max(night) over (partition by hotel_id, run) as run_end "
+        "from runs "
+        ") "
+        "select hotel_id, array_agg(night order by night) as checkins "
+        "from run_ends "
+        "where run_end - night >= :nights - 1 "
+        "group by hotel_id "
+        "order by hotel_id"
+    )
+)
+
+
+def search_hotels(checkin, checkout, room_types=None, names=None, surface_types=None):
+    """
+    Return a query for hotels with a free room on every night of a stay.
+
+    A night counts as free when any of the requested room types has at least
+    one room left. Inventory is grouped by hotel in a single pass and a hotel
+    is kept when its count of free nights equals the length of the stay.
+
+    :param checkin: First night of the stay
+    :param checkout: Checkout date (the night before is the last night)
+    :param room_types: Room types to consider, defaults to all room types
+    :param names: Optional list of hotel names to restrict the search to
+    :param surface_types: Optional list of asteroid surface compositions
+    :return: SQLAlchemy query yielding Hotels rows
+    """
+    last_night = checkout - timedelta(days=1)
+    nights = (checkout - checkin).days
+    room_types = tuple(room_types) if room_types else ROOM_TYPES
+
+    hotels = (
+        db.session.query(Hotels)
+        .join(RoomInventory, RoomInventory.hotel_id == Hotels.id)
+        .filter(
+            RoomInventory.date.between(checkin, last_night),
+            RoomInventory.room_type.in_(room_types),
+            (RoomInventory.max_rooms_available - RoomInventory.rooms_reserved) > 0,
+        )
+    )
+    if names:
+        hotels = hotels.filter(Hotels.name.in_(names))
+    if surface_types:
+        hotels = hotels.filter(Hotels.astrd_surface_composition.in_(surface_types))
+
+    return (
+        hotels.group_by(Hotels.id)
+        .having(func.count(distinct(RoomInventory.date)) == nights)
+        .order_by(Hotels.id)
+    )
+
+
+def search_hotels_cached(
+    checkin, checkout, room_types=None, names=None, surface_types=None
+):
+    """
+    Return hotels available for a stay as dicts, from availability_cache when
+    no candidate hotel's inventory has changed since the result was cached.
+
+    The inventory signature is read before searching, so a change committed
+    while the search runs leaves an older signature next to the result and
+    the next lookup recomputes it.
+
+    :param checkin: First night of the stay
+    :param checkout: Checkout date (the night before is the last night)
+    :param room_types: Room types to consider, defaults to all room types
+    :param names: Optional list of hotel names to restrict the search to
+    :param surface_types: Optional list of asteroid surface compositions
+    :return: List of hotel dicts
+    """
+    key = (
+        checkin,
+        checkout,
+        tuple(sorted(set(room_types or ROOM_TYPES))),
+        tuple(sorted(set(names or ()))),
+        tuple(sorted(set(surface_types or ()))),
+    )
+    signature = InventoryVersions.signature(names=names, surface_types=surface_types)
+    hotels = availability_cache.get(key, signature)
+    if hotels is None:
+        hotels = [
+            row2dict(hotel)
+            for hotel in search_hotels(
+                checkin, checkout, room_types, names, surface_types
+            )
+        ]
+        availability_cache.set(key, signature, hotels)
+
+    return hotels
+
+
+def search_available(
+    checkin, checkout, room_types=None, names=None, surface_types=None
+):
+    """
+    Return hotels available for a stay as dicts, from availability_index when
+    it is enabled and covers the stay, otherwise from search_hotels_cached.
+
+    :param checkin: First night of the stay
+    :param checkout: Checkout date (the night before is the last night)
+    :param room_types: Room types to consider, defaults to all room types
+    :param names: Optional list of hotel names to restrict the search to
+    :param surface_types: Optional list of asteroid surface compositions
+    :return: List of hotel dicts
+    """
+    hotels = None
+    if availability_index.enabled:
+        hotels = availability_index.search(
+            checkin, checkout, room_types, names, surface_types
+        )
+    if hotels is None:
+        hotels = search_hotels_cached(
+            checkin, checkout, room_types, names, surface_types
+        )
+
+    return hotels
+
+
+def search_flexible(
+    window_start,
+    window_end,
+    nights,
+    room_types=None,
+    names=None,
+    surface_types=None,
+):
+    """
+    Return hotels with the check-in dates of every stay of the given length
+    that fits in [window_start, window_end), in one pass over room_inventory.
+
+    :param window_start: Earliest check-in date
+    :param window_end: Latest checkout date
+    :param nights: Length of the stay
+    :param room_types: Room types to consider, defaults to all room types
+    :param names: Optional list of hotel names to restrict the search to
+    :param surface_types: Optional list of asteroid surface compositions
+    :return: List of hotel dicts with their checkin_dates
+    """
+    checkins = dict(
+        db.session.execute(
+            FLEXIBLE_CHECKINS,
+            {
+                "window_start": window_start,
+                "window_end": window_end,
+                "nights": nights,
+                "room_types": list(room_types or ROOM_TYPES),
+                "names": names or None,
+                "surface_types": surface_types or None,
+            },
+        ).fetchall()
+    )
+    if not checkins:
+        return []
+    hotels = Hotels.query.filter(Hotels.id.in_(checkins)).order_by(Hotels.id)
+
+    return [dict(row2dict(hotel), checkin_dates=checkins[hotel.id]) for hotel in hotels]
+
+
+def with_distances(hotels, day, sort_by_distance=False, max_distance_au=None):
+    """
+    Return copies of hotel dicts with the Earth distance of their asteroid.
+
+    :param hotels: Hotel dicts with ephem_data
+    :param day: Date of the distances, usually the checkin date
+    :param sort_by_distance: Order hotels nearest first, hotels without a
+        distance last
+    :param max_distance_au: Drop hotels farther away or without a distance
+    :return: List of hotel dicts with earth_distance_au
+    """
+    # Distances precomputed by ``hotel_api ephemeris precompute`` are memoized
+    #  first, so only hotels without rows for the day are computed here.
+    missing = [
+        (hotel["id"], hotel["ephem_data"])
+        for hotel in hotels
+        if not ephemeris.memoized(hotel["ephem_data"], day)
+    ]
+    for ephem_data, distance in HotelEphemeris.earth_distances(missing, day).items():
+        ephemeris.memoize(ephem_data, day, distance)
+    hotels = [
+        dict(
+            hotel, earth_distance_au=ephemeris.earth_distance(hotel["ephem_data"], day)
+        )
+        for hotel in hotels
+    ]
+    if max_distance_au is not None:
+        hotels = [
+            hotel
+            for hotel in hotels
+            if hotel["earth_distance_au"] is not None
+            and hotel["earth_distance_au"] <= max_distance_au
+        ]
+    if sort_by_distance:
+        hotels.sort(
+            key=lambda hotel: (
+                hotel["earth_distance_au"] is None,
+                hotel["earth_distance_au"] or 0,
+            )
+        )
+
+    return hotels
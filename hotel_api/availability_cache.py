@@ -0,0 +1,69 @@
+"""In-process cache of availability search results."""
+import threading
+from collections import OrderedDict
+
+
+class AvailabilityCache(object):
+    """
+    Bounded LRU cache of availability search results keyed by search args.
+
+    Each result is stored with the inventory signature read before it was
+    computed (see hotel_api.models.InventoryVersions.signature). A result is
+    only returned while the current signature is unchanged, so a booking,
+    cancellation or capacity change of any hotel the search could return
+    invalidates it in every worker on the next lookup.
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 0
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get("AVAILABILITY_CACHE_SIZE", 0)
+
+    def get(self, key, signature):
+        """Return the cached result for key if signature still matches, or None."""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, signature, result):
+        """Cache a result, evicting the least recently used entries."""
+        if not self.max_size:
+            return None
+        with self._lock:
+            self._results[key] = (signature, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+        return None
+
+    def stats(self):
+        """Return the size of the cache and its hit and miss counters."""
+        with self._lock:
+            return dict(
+                size=len(self._results),
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+        return None
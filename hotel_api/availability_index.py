@@ -0,0 +1,217 @@
+"""Optional in-process availability index backed by a NumPy array.
+
+Enabled with AVAILABILITY_INDEX and requires numpy, which is not installed by
+default. The index holds free room counts for every hotel, night and room
+type in the AVAILABILITY_INDEX_DAYS nights starting on the day it was loaded,
+and answers availability searches without querying Postgres.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from hotel_api.routing import read_only
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ROOM_TYPES = ("double", "queen", "king")
+ROOM_TYPE_INDEX = {room_type: i for i, room_type in enumerate(ROOM_TYPES)}
+
+# Free rooms per (hotel, room type) as arrays of night offsets and counts
+LOAD_INVENTORY = read_only(
+    text(
+        "select hotel_id, room_type, "
+        "array_agg(cast(date as date) - cast(:start as date) order by date), "
+        "array_agg(max_rooms_available - rooms_reserved order by date) "
+        "from hotel_api.room_inventory "
+        "where date >= :start and date < :end "
+        "and (cast(:hotel_ids as integer[]) is null "
+        "or hotel_id = any(cast(:hotel_ids as integer[]))) "
+        "group by hotel_id, room_type"
+    )
+)
+
+
+class AvailabilityIndex(object):
+    """
+    Hotels x nights x room types array of free rooms, searched vectorized.
+
+    Changes are picked up incrementally: at most every
+    AVAILABILITY_INDEX_REFRESH_SECONDS the per hotel inventory versions are
+    compared with the versions loaded and only the hotels that changed are
+    reloaded. Results can therefore lag a booking by that long; bookings are
+    still checked against the database when they are made.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.days = 0
+        self.refresh_seconds = 0
+        self.start = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._reset()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("AVAILABILITY_INDEX", False)
+        self.days = app.config.get("AVAILABILITY_INDEX_DAYS", 365)
+        self.refresh_seconds = app.config.get("AVAILABILITY_INDEX_REFRESH_SECONDS", 1)
+        if self.enabled and np is None:
+            raise RuntimeError("AVAILABILITY_INDEX requires numpy to be installed.")
+
+    def _reset(self):
+        self._hotels = []
+        self._rows = {}
+        self._versions = {}
+        if np is not None:
+            self._free = np.zeros((0, self.days, len(ROOM_TYPES)), dtype=np.int16)
+            self._active = np.zeros(0, dtype=bool)
+            self._names = np.zeros(0, dtype=object)
+            self._surfaces = np.zeros(0, dtype=object)
+
+    def load(self):
+        """Load every hotel's inventory for the nights starting today."""
+        from hotel_api.models import InventoryVersions
+
+        with self._lock:
+            self.start = date.today()
+            self._reset()
+            versions = InventoryVersions.versions()
+            self._load_hotels(None)
+            self._versions = versions
+            self._refreshed_at = time.monotonic()
+
+        return None
+
+    def refresh(self):
+        """Reload the hotels whose inventory version changed since the last load."""
+        from hotel_api.models import InventoryVersions
+
+        if self.start != date.today():
+            return self.load()
+
+        versions = InventoryVersions.versions()
+        changed = [
+            hotel_id
+            for hotel_id, version in versions.items()
+            if self._versions.get(hotel_id) != version
+        ]
+        with self._lock:
+            if changed:
+                self._load_hotels(changed)
+            self._versions = versions
+            self._refreshed_at = time.monotonic()
+
+        return None
+
+    def _load_hotels(self, hotel_ids):
+        """Load hotel rows and inventory for hotel_ids, or for every hotel."""
+        from hotel_api.extensions import db
+        from hotel_api.models import Hotels
+
+        hotels = db.session.query(*Hotels.__table__.columns).order_by(Hotels.id)
+        if hotel_ids is not None:
+            hotels = hotels.filter(Hotels.id.in_(hotel_ids))
+            # Deleted hotels stay in the array but never match again
+            for hotel_id in hotel_ids:
+                if hotel_id in self._rows:
+                    self._active[self._rows[hotel_id]] = False
+        new_rows = []
+        for hotel in hotels:
+            hotel = hotel._asdict()
+            if hotel["id"] in self._rows:
+                row = self._rows[hotel["id"]]
+                self._hotels[row] = hotel
+                self._names[row] = hotel["name"]
+                self._active[row] = True
+            else:
+                self._rows[hotel["id"]] = len(self._hotels)
+                self._hotels.append(hotel)
+                new_rows.append(hotel)
+        if new_rows:
+            self._grow(new_rows)
+
+        if hotel_ids is not None:
+            self._free[[self._rows[h] for h in hotel_ids if h in self._rows]] = 0
+        inventory = db.session.execute(
+            LOAD_INVENTORY,
+            {
+                "start": self.start,
+                "end": self.start + timedelta(days=self.days),
+                "hotel_ids": hotel_ids,
+            },
+        )
+        for hotel_id, room_type, offsets, free in inventory:
+            if hotel_id in self._rows and room_type in ROOM_TYPE_INDEX:
+                row, column = self._rows[hotel_id], ROOM_TYPE_INDEX[room_type]
+                self._free[row, offsets, column] = free
+
+        return None
+
+    def _grow(self, hotels):
+        """Append array rows for hotels new to the index."""
+        n = len(hotels)
+        self._free = np.concatenate(
+            [self._free, np.zeros((n, self.days, len(ROOM_TYPES)), dtype=np.int16)]
+        )
+        self._active = np.concatenate([self._active, np.ones(n, dtype=bool)])
+        self._names = np.concatenate(
+            [self._names, np.array([h["name"] for h in hotels], dtype=object)]
+        )
+        self._surfaces = np.concatenate(
+            [
+                self._surfaces,
+                np.array(
+                    [h["astrd_surface_composition"] for h in hotels], dtype=object
+                ),
+            ]
+        )
+
+        return None
+
+    def search(
+        self, checkin, checkout, room_types=None, names=None, surface_types=None
+    ):
+        """
+        Return hotels with a free room of the requested types on every night
+        of the stay, as dicts ordered by id, or None when the stay is not
+        covered by the index and the caller should search the database.
+        """
+        if self.start is None:
+            self.load()
+        elif time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            self.refresh()
+
+        first = (checkin - self.start).days
+        last = (checkout - self.start).days
+        if first < 0 or last > self.days or last <= first:
+            return None
+        types = [ROOM_TYPE_INDEX[t] for t in (room_types or ROOM_TYPES)]
+
+        with self._lock:
+            # A night is free if any requested room type has a room left, and
+            #  a hotel matches if the minimum over the stay's nights is free.
+            nights = (self._free[:, first:last, :][:, :, types] > 0).any(axis=2)
+            matches = nights.all(axis=1) & self._active
+            if names:
+                matches &= np.isin(self._names, names)
+            if surface_types:
+                matches &= np.isin(self._surfaces, surface_types)
+            return [self._hotels[row] for row in np.flatnonzero(matches)]
+
+    def stats(self):
+        """Return the loaded window, hotel count and array size of the index."""
+        return dict(
+            enabled=self.enabled,
+            start=self.start and self.start.isoformat(),
+            days=self.days,
+            hotels=len(self._hotels),
+            megabytes=round(self._free.nbytes / 1024 / 1024, 1) if np else 0,
+        )
@@ -0,0 +1,107 @@
+"""Earth distances of hotel asteroids computed with ephem."""
+import threading
+from collections import OrderedDict
+
+import ephem
+
+
+class Ephemeris(object):
+    """
+    Bounded LRU caches of parsed ephem bodies and their Earth distances.
+
+    Bodies are cached by ephem_data line, so a hotel whose ephem_data changes
+    is parsed again, and distances are memoized per (ephem_data, date).
+    Lines ephem cannot parse have no distance.
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 0
+        self.hits = 0
+        self.misses = 0
+        self._bodies = OrderedDict()
+        self._distances = OrderedDict()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get("EPHEMERIS_CACHE_SIZE", 0)
+
+    def _remember(self, cache, key, value):
+        if not self.max_size:
+            return None
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+
+        return None
+
+    def _body(self, ephem_data):
+        """Return the cached body of an ephem_data line, or None if invalid."""
+        if ephem_data in self._bodies:
+            self._bodies.move_to_end(ephem_data)
+            return self._bodies[ephem_data]
+        try:
+            body = ephem.readdb(ephem_data)
+        except ValueError:
+            body = None
+        self._remember(self._bodies, ephem_data, body)
+        return body
+
+    def earth_distance(self, ephem_data, day):
+        """
+        Return the distance between Earth and an asteroid at 00:00 UTC on day.
+
+        :param ephem_data: XEphem database line of the asteroid
+        :param day: Date of the position
+        :return: Distance in AU, or None if ephem_data cannot be parsed
+        """
+        key = (ephem_data, day)
+        # Bodies are mutated by compute(), so parsing and computing are locked
+        with self._lock:
+            if key in self._distances:
+                self._distances.move_to_end(key)
+                self.hits += 1
+                return self._distances[key]
+            self.misses += 1
+            body = self._body(ephem_data)
+            distance = None
+            if body is not None:
+                body.compute(ephem.Date((day.year, day.month, day.day)))
+                distance = body.earth_distance
+            self._remember(self._distances, key, distance)
+            return distance
+
+    def memoized(self, ephem_data, day):
+        """Return whether the distance of ephem_data on day is memoized."""
+        with self._lock:
+            return (ephem_data, day) in self._distances
+
+    def memoize(self, ephem_data, day, distance):
+        """Memoize a distance computed elsewhere, e.g. in hotel_ephemeris."""
+        with self._lock:
+            self._remember(self._distances, (ephem_data, day), distance)
+
+        return None
+
+    def stats(self):
+        """Return the size of the caches and the distance hit and miss counters."""
+        with self._lock:
+            return dict(
+                bodies=len(self._bodies),
+                distances=len(self._distances),
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self._distances.clear()
+            self.hits = 0
+            self.misses = 0
+
+        return None
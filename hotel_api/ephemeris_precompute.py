@@ -0,0 +1,155 @@
+"""Precompute daily asteroid positions of every hotel in a process pool.
+
+Positions for the days of the inventory horizon are computed with ephem in
+worker processes, one chunk of EPHEMERIS_PRECOMPUTE_CHUNK_SIZE hotels per
+task, and COPYed into hotel_ephemeris by the parent, which commits each chunk
+with the hotels' sources. Only hotels missing days or whose ephem_data
+changed since they were computed are worked on, so a re-run only adds the
+days the horizon moved forward by, dropping days gone by, and an interrupted
+run resumes where it stopped.
+"""
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import ephem
+from flask import current_app
+from sqlalchemy import text
+
+from hotel_api.extensions import db
+from hotel_api.models import HotelEphemerisSources
+from lib.util_datetime import months_out
+
+POSITION_COLUMNS = (
+    "hotel_id",
+    "date",
+    "hlon",
+    "hlat",
+    "sun_distance",
+    "ra",
+    "dec",
+    "earth_distance",
+)
+
+COPY_POSITIONS = (
+    f"copy hotel_api.hotel_ephemeris ({', '.join(POSITION_COLUMNS)}) "
+    "from stdin with (format csv)"
+)
+
+# Past days, and every day of hotels whose ephem_data changed
+DELETE_POSITIONS = text(
+    "delete from hotel_api.hotel_ephemeris "
+    "where hotel_id = any(cast(:hotel_ids as integer[])) "
+    "and (date < :first_day or hotel_id = any(cast(:changed as integer[])))"
+)
+
+
+def compute_positions(tasks):
+    """
+    Compute the daily positions of a chunk of hotels' asteroids.
+
+    Runs in worker processes, so it only uses its arguments. Hotels whose
+    ephem_data ephem cannot parse get no rows.
+
+    :param tasks: List of (hotel_id, ephem_data, first day, number of days)
+    :return: CSV text of hotel_ephemeris rows in POSITION_COLUMNS order
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for hotel_id, ephem_data, first_day, days in tasks:
+        try:
+            body = ephem.readdb(ephem_data)
+        except ValueError:
+            continue
+        for n in range(days):
+            day = first_day + timedelta(days=n)
+            body.compute(ephem.Date((day.year, day.month, day.day)))
+            writer.writerow(
+                (
+                    hotel_id,
+                    day.isoformat(),
+                    repr(float(body.hlon)),
+                    repr(float(body.hlat)),
+                    repr(body.sun_distance),
+                    repr(float(body.a_ra)),
+                    repr(float(body.a_dec)),
+                    repr(body.earth_distance),
+                )
+            )
+
+    return buffer.getvalue()
+
+
+def _chunks(items, size):
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def precompute_positions(months=None, workers=None, chunk_size=None, progress=None):
+    """
+    Bring hotel_ephemeris up to date for the days from today to the horizon.
+
+    :param months: Months of positions from today, INVENTORY_HORIZON_MONTHS by
+        default
+    :param workers: Worker processes, one per CPU by default
+    :param chunk_size: Hotels per worker task and commit,
+        EPHEMERIS_PRECOMPUTE_CHUNK_SIZE by default
+    :param progress: Optional callable receiving the stats after each chunk
+    :return: Dict with the hotels that were missing positions, hotels
+        computed so far, hotels recomputed because their ephem_data changed
+        and rows written
+    """
+    months = months or current_app.config["INVENTORY_HORIZON_MONTHS"]
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or current_app.config["EPHEMERIS_PRECOMPUTE_CHUNK_SIZE"]
+    first_day = date.today()
+    end_date = months_out(first_day, months)
+    computed_through = end_date - timedelta(days=1)
+
+    stale = HotelEphemerisSources.stale(first_day, end_date)
+    db.session.commit()
+    stats = dict(stale=len(stale), computed=0, changed=0, rows=0)
+    tasks = [
+        (hotel_id, ephem_data, start, (end_date - start).days)
+        for hotel_id, ephem_data, changed, start in stale
+    ]
+    changed = {hotel_id for hotel_id, _, is_changed, _ in stale if is_changed}
+
+    def write(chunk, rows):
+        hotel_ids = [task[0] for task in chunk]
+        replaced = [hotel_id for hotel_id in hotel_ids if hotel_id in changed]
+        db.session.execute(
+            DELETE_POSITIONS,
+            {"hotel_ids": hotel_ids, "first_day": first_day, "changed": replaced},
+        )
+        connection = db.session.connection()
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(COPY_POSITIONS, io.StringIO(rows))
+        HotelEphemerisSources.record(
+            [(task[0], task[1]) for task in chunk], computed_through
+        )
+        db.session.commit()
+        stats["computed"] += len(chunk)
+        stats["changed"] += len(replaced)
+        stats["rows"] += rows.count("\n")
+        if progress is not None:
+            progress(stats)
+
+    # Forked workers must not share the parent's pooled connections
+    db.engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Results are written in the order submitted, with a bounded number
+        #  of chunks in flight so finished rows do not pile up in memory.
+        pending = deque()
+        for chunk in _chunks(tasks, chunk_size):
+            pending.append((chunk, pool.submit(compute_positions, chunk)))
+            if len(pending) >= workers * 2:
+                chunk, future = pending.popleft()
+                write(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            write(chunk, future.result())
+
+    return stats
@@ -1,8 +1,14 @@
 from flask import Blueprint, url_for
 from flask_restx import Api
-from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 
+from hotel_api.availability_cache import AvailabilityCache
+from hotel_api.availability_index import AvailabilityIndex
+from hotel_api.ephemeris import Ephemeris
+from hotel_api.passwords import PasswordHasher
+from hotel_api.routing import RoutingSQLAlchemy
+from hotel_api.token_cache import TokenCache, TokenBlacklist
+
 
 # Fix mixed content error when api is served from behind https proxy
 # For context see: https://github.com/python-restx/flask-restx/issues/188
@@ -30,5 +36,11 @@ api = PatchedApi(
     doc="/docs",
     authorizations=authorizations,
 )
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 bcrypt = Bcrypt()
+password_hasher = PasswordHasher(bcrypt)
+token_cache = TokenCache()
+token_blacklist = TokenBlacklist()
+availability_cache = AvailabilityCache()
+availability_index = AvailabilityIndex()
+ephemeris = Ephemeris()
@@ -0,0 +1,206 @@
+"""Bulk import of hotels, their rooms and inventory from CSV or JSONL.
+
+Rows are validated and streamed in chunks of HOTEL_IMPORT_CHUNK_SIZE. Each
+chunk is COPYed into a temporary staging table and turned into hotels, rooms
+and inventory nights by one set-based statement, then committed. Rooms and
+inventory are generated server side, so neither this process nor the wire
+carries more than one chunk of hotel rows at a time. Hotels whose name
+already exists are skipped, which makes an interrupted import safe to re-run.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from hotel_api.extensions import db
+from lib.util_datetime import months_out
+
+FORMATS = ("csv", "jsonl")
+
+HOTEL_COLUMNS = (
+    "name",
+    "established_date",
+    "proprietor",
+    "astrd_diameter",
+    "astrd_surface_composition",
+    "ephem_data",
+)
+ROOM_COLUMNS = ("total_double_rooms", "total_queen_rooms", "total_king_rooms")
+STAGING_COLUMNS = ("line",) + HOTEL_COLUMNS + ROOM_COLUMNS
+
+# Errors reported back in full, further invalid rows are only counted
+MAX_REPORTED_ERRORS = 100
+
+CREATE_STAGING = (
+    "create temp table if not exists hotel_import_staging ("
+    "line integer, name text, established_date text, proprietor text, "
+    "astrd_diameter double precision, astrd_surface_composition text, "
+    "ephem_data text, total_double_rooms integer, total_queen_rooms integer, "
+    "total_king_rooms integer"
+    ") on commit delete rows"
+)
+
+COPY_STAGING = (
+    f"copy hotel_import_staging ({', '.join(STAGING_COLUMNS)}) "
+    "from stdin with (format csv)"
+)
+
+# The first row of a name repeated within the chunk wins. Child rows are
+#  checked against hotels at the end of the statement, after every CTE ran.
+INSERT_STAGED = text(
+    "with staged as ( "
+    "select distinct on (name) * from hotel_import_staging order by name, line "
+    "), "
+    "inserted as ( "
+    "insert into hotel_api.hotels (name, established_date, proprietor, "
+    "astrd_diameter, astrd_surface_composition, ephem_data, "
+    "created_date, last_modified_date) "
+    "select name, established_date, proprietor, astrd_diameter, "
+    "astrd_surface_composition, ephem_data, :now, :now "
+    "from staged order by line "
+    "on conflict (name) do nothing "
+    "returning id, name "
+    "), "
+    "capacity as ( "
+    "select i.id as hotel_id, c.room_type, c.max_rooms "
+    "from inserted i join staged s on s.name = i.name "
+    "cross join lateral (values ('double', s.total_double_rooms), "
+    "('queen', s.total_queen_rooms), ('king', s.total_king_rooms)) "
+    "as c(room_type, max_rooms) "
+    "), "
+    "rooms as ( "
+    "insert into hotel_api.rooms (type, hotel_id, created_date, last_modified_date) "
+    "select c.room_type, c.hotel_id, :now, :now "
+    "from capacity c cross join lateral generate_series(1, c.max_rooms) "
+    "), "
+    "inventory as ( "
+    "insert into hotel_api.room_inventory (date, hotel_id, room_type, "
+    "max_rooms_available, rooms_reserved, created_date, last_modified_date) "
+    "select night, c.hotel_id, c.room_type, c.max_rooms, 0, :now, :now "
+    "from capacity c "
+    "cross join generate_series(cast(:first_night as date), "
+    "cast(:end_date as date) - 1, interval '1 day') as night "
+    "), "
+    "bumped as ( "
+    "insert into hotel_api.inventory_versions (hotel_id, version, "
+    "created_date, last_modified_date) "
+    "select id, 1, :now, :now from inserted order by id "
+    "on conflict (hotel_id) do update "
+    "set version = inventory_versions.version + 1, "
+    "last_modified_date = excluded.last_modified_date "
+    ") "
+    "select count(*) from inserted"
+)
+
+
+def read_rows(lines, format):
+    """
+    Yield (line number, dict) for each hotel in an iterable of text lines.
+
+    :param lines: Iterable of str lines, e.g. an open text file
+    :param format: "csv" with a header row, or "jsonl" with one object per line
+    """
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == "jsonl":
+        for line_num, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_num, row
+    else:
+        raise ValueError(f"Unknown import format {format}.")
+
+
+def validate_row(row):
+    """
+    Return the staging values of a hotel row, or raise ValueError.
+
+    :param row: Dict with the hotel columns and room counts
+    :return: Tuple of the hotel columns and room counts
+    """
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object.")
+    missing = [
+        column
+        for column in HOTEL_COLUMNS + ROOM_COLUMNS
+        if column != "proprietor" and row.get(column) in (None, "")
+    ]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}.")
+    rooms = tuple(int(row[column]) for column in ROOM_COLUMNS)
+    if min(rooms) < 0:
+        raise ValueError("Room counts cannot be negative.")
+    return (
+        str(row["name"]),
+        str(row["established_date"]),
+        row.get("proprietor") or None,
+        float(row["astrd_diameter"]),
+        str(row["astrd_surface_composition"]),
+        str(row["ephem_data"]),
+    ) + rooms
+
+
+def import_hotels(lines, format, chunk_size=None, inv_months=None, progress=None):
+    """
+    Import hotels with their rooms and inventory from CSV or JSONL lines.
+
+    :param lines: Iterable of str lines, e.g. an open text file
+    :param format: "csv" or "jsonl", see read_rows
+    :param chunk_size: Hotels per COPY and commit, HOTEL_IMPORT_CHUNK_SIZE by
+        default
+    :param inv_months: Months of inventory from today, INVENTORY_HORIZON_MONTHS
+        by default
+    :param progress: Optional callable receiving the stats after each chunk
+    :return: Dict with the rows read, hotels imported, rows skipped because
+        the hotel exists, invalid rows and the first invalid rows' errors
+    """
+    chunk_size = chunk_size or current_app.config["HOTEL_IMPORT_CHUNK_SIZE"]
+    inv_months = inv_months or current_app.config["INVENTORY_HORIZON_MONTHS"]
+    first_night = date.today()
+    end_date = months_out(first_night, inv_months)
+    stats = dict(read=0, imported=0, skipped=0, invalid=0, errors=[])
+
+    def flush(chunk):
+        connection = db.session.connection()
+        connection.execute(CREATE_STAGING)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(COPY_STAGING, buffer)
+        imported = db.session.execute(
+            INSERT_STAGED,
+            {"now": datetime.now(), "first_night": first_night, "end_date": end_date},
+        ).scalar()
+        db.session.commit()
+        stats["imported"] += imported
+        stats["skipped"] += len(chunk) - imported
+        if progress is not None:
+            progress(stats)
+
+    chunk = []
+    for line, row in read_rows(lines, format):
+        stats["read"] += 1
+        try:
+            chunk.append((line,) + validate_row(row))
+        except (TypeError, ValueError) as e:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                stats["errors"].append(dict(line=line, error=str(e)))
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return stats
@@ -0,0 +1,103 @@
+"""Periodic maintenance jobs run in background threads of the app process.
+
+Jobs are opt-in through config and started by create_app. Each job runs its
+function inside an application context every ``interval`` seconds and keeps
+simple counters of its runs and results.
+"""
+import logging
+import threading
+from datetime import date, datetime
+
+from lib.util_datetime import months_out
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(threading.Thread):
+    """Daemon thread calling fn every interval seconds within an app context."""
+
+    def __init__(self, app, name, interval, fn):
+        super(PeriodicJob, self).__init__(name=name, daemon=True)
+        self.app = app
+        self.interval = interval
+        self.fn = fn
+        self.stats = dict(runs=0, errors=0, total=0, last_result=None, last_run=None)
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def run_once(self):
+        """Run the job now and record its result, which must be a row count."""
+        with self.app.app_context():
+            try:
+                result = self.fn()
+            except Exception:
+                self.stats["errors"] += 1
+                logger.exception("Job %s failed", self.name)
+                return None
+        self.stats["runs"] += 1
+        self.stats["total"] += result
+        self.stats["last_result"] = result
+        self.stats["last_run"] = datetime.now()
+        logger.info("Job %s processed %s rows", self.name, result)
+
+        return result
+
+    def stop(self):
+        self._stopped.set()
+
+
+jobs = {}
+
+
+def job_stats():
+    """Return a copy of the counters of every registered job by name."""
+    return {
+        name: dict(
+            job.stats,
+            alive=job.is_alive(),
+            last_run=job.stats["last_run"] and job.stats["last_run"].isoformat(),
+        )
+        for name, job in jobs.items()
+    }
+
+
+def start_jobs(app):
+    """
+    Start the background jobs enabled in the app config.
+
+    :param app: Flask application instance
+    :return: Dict of running jobs by name
+    """
+    from hotel_api.models import BlacklistedTokens, RoomInventory
+
+    interval = app.config.get("TOKEN_PURGE_INTERVAL_SECONDS")
+    if interval and "purge_expired_tokens" not in jobs:
+        batch_size = app.config.get("TOKEN_PURGE_BATCH_SIZE")
+        jobs["purge_expired_tokens"] = PeriodicJob(
+            app,
+            "purge_expired_tokens",
+            interval,
+            lambda: BlacklistedTokens.purge_expired(batch_size=batch_size),
+        )
+
+    interval = app.config.get("INVENTORY_HORIZON_INTERVAL_SECONDS")
+    if interval and "extend_inventory_horizon" not in jobs:
+        months = app.config.get("INVENTORY_HORIZON_MONTHS")
+        batch_size = app.config.get("INVENTORY_HORIZON_BATCH_SIZE")
+        jobs["extend_inventory_horizon"] = PeriodicJob(
+            app,
+            "extend_inventory_horizon",
+            interval,
+            lambda: RoomInventory.extend_horizon(
+                end_date=months_out(date.today(), months), batch_size=batch_size
+            ),
+        )
+
+    for job in jobs.values():
+        if not job.is_alive():
+            job.start()
+
+    return jobs
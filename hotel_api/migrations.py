@@ -0,0 +1,116 @@
+"""Bring databases created from older models up to date with the current schema.
+
+``hotel_api db init`` builds a fresh schema with ``db.create_all()``, which
+already includes everything below. Existing databases are upgraded in place
+with ``hotel_api db migrate``. Every statement is idempotent so migrations can
+be re-run safely and resumed after a failure.
+"""
+from hotel_api.extensions import db
+
+MIGRATIONS = [
+    (
+        "0001_room_inventory_indexes",
+        [
+            # Fails if duplicate (hotel_id, room_type, date) rows exist. Those
+            #  must be reconciled by hand since each may hold reservations.
+            "create unique index if not exists uq_room_inventory_hotel_room_type_date "
+            "on hotel_api.room_inventory (hotel_id, room_type, date);",
+            "create index if not exists ix_room_inventory_free_date "
+            "on hotel_api.room_inventory (date, room_type, hotel_id) "
+            "where max_rooms_available - rooms_reserved > 0;",
+        ],
+    ),
+    (
+        "0002_blacklisted_tokens_by_hash",
+        [
+            "alter table hotel_api.blacklisted_tokens "
+            "add column if not exists token_hash varchar(64);",
+            # Hash and drop the raw token column if it is still there
+            "do $$ begin "
+            "if exists (select 1 from information_schema.columns "
+            "where table_schema = 'hotel_api' "
+            "and table_name = 'blacklisted_tokens' and column_name = 'token') then "
+            "update hotel_api.blacklisted_tokens "
+            "set token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex') "
+            "where token_hash is null; "
+            "alter table hotel_api.blacklisted_tokens drop column token; "
+            "end if; "
+            "end $$;",
+            "alter table hotel_api.blacklisted_tokens "
+            "alter column token_hash set not null;",
+            "create unique index if not exists blacklisted_tokens_token_hash_key "
+            "on hotel_api.blacklisted_tokens (token_hash);",
+            "create index if not exists ix_blacklisted_tokens_expires_at "
+            "on hotel_api.blacklisted_tokens (expires_at);",
+        ],
+    ),
+    (
+        "0003_rooms_hotel_id_index",
+        [
+            "create index if not exists ix_rooms_hotel_id_type "
+            "on hotel_api.rooms (hotel_id, type);",
+        ],
+    ),
+    (
+        "0004_hotel_children_on_delete_cascade",
+        [
+            "alter table hotel_api.rooms "
+            "drop constraint if exists rooms_hotel_id_fkey, "
+            "add constraint rooms_hotel_id_fkey foreign key (hotel_id) "
+            "references hotel_api.hotels (id) on delete cascade;",
+            "alter table hotel_api.room_inventory "
+            "drop constraint if exists room_inventory_hotel_id_fkey, "
+            "add constraint room_inventory_hotel_id_fkey foreign key (hotel_id) "
+            "references hotel_api.hotels (id) on delete cascade;",
+        ],
+    ),
+    (
+        "0005_inventory_versions",
+        [
+            "create table if not exists hotel_api.inventory_versions ("
+            "hotel_id integer not null primary key, "
+            "version bigint not null, "
+            "created_date timestamp without time zone not null, "
+            "last_modified_date timestamp without time zone not null);",
+        ],
+    ),
+    (
+        "0006_hotel_ephemeris",
+        [
+            "create table if not exists hotel_api.hotel_ephemeris ("
+            "hotel_id integer not null "
+            "references hotel_api.hotels (id) on delete cascade, "
+            "date date not null, "
+            "hlon real not null, "
+            "hlat real not null, "
+            "sun_distance real not null, "
+            "ra real not null, "
+            "dec real not null, "
+            "earth_distance real not null, "
+            "primary key (hotel_id, date));",
+            "create table if not exists hotel_api.hotel_ephemeris_sources ("
+            "hotel_id integer not null primary key "
+            "references hotel_api.hotels (id) on delete cascade, "
+            "ephem_digest varchar(32) not null, "
+            "computed_through date not null, "
+            "created_date timestamp without time zone not null, "
+            "last_modified_date timestamp without time zone not null);",
+        ],
+    ),
+]
+
+
+def run_migrations():
+    """
+    Apply every migration in order, each in its own transaction.
+
+    :return: List of applied migration names
+    """
+    applied = []
+    for name, statements in MIGRATIONS:
+        with db.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(statement)
+        applied.append(name)
+
+    return applied
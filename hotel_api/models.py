@@ -1,14 +1,17 @@
+from collections import Counter
 from datetime import datetime, date, timedelta
 
 import jwt
 from flask import current_app, abort
-from sqlalchemy import func
+from sqlalchemy import func, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import and_
 
 from lib.util_datetime import daterange, months_out
-from lib.util_sqlalchemy import row2dict
-from hotel_api.extensions import db, bcrypt
+from lib.util_sqlalchemy import row2dict, keyset_page
+from hotel_api.extensions import db, password_hasher, token_cache, token_blacklist
+from hotel_api.routing import read_only
+from hotel_api.token_cache import token_digest
 
 
 class BaseTable(object):
@@ -16,34 +19,104 @@ class BaseTable(object):
     created_date = db.Column(db.DateTime, nullable=False)
     last_modified_date = db.Column(db.DateTime, nullable=False)
 
+    @classmethod
+    def version(cls, id):
+        """Return (last_modified_date, id) of a row by primary key, or None."""
+        return (
+            db.session.query(cls.last_modified_date, cls.id)
+            .filter(cls.id == id)
+            .first()
+        )
+
+    @classmethod
+    def page_version(cls, after, limit):
+        """
+        Return the newest last_modified_date, row count and id sum of a keyset
+        page, followed by the page cursor and size.
+        """
+        page = keyset_page(
+            db.session.query(cls.id, cls.last_modified_date), cls.id, after, limit
+        ).subquery()
+        newest, rows, id_sum = db.session.query(
+            func.max(page.c.last_modified_date),
+            func.count(),
+            func.coalesce(func.sum(page.c.id), 0),
+        ).one()
+        return newest, rows, id_sum, after, limit
+
 
 class BlacklistedTokens(BaseTable, db.Model):
     __tablename__ = "blacklisted_tokens"
+    __table_args__ = (
+        # Serves purging expired tokens in batches
+        db.Index("ix_blacklisted_tokens_expires_at", "expires_at"),
+        BaseTable.__table_args__,
+    )
     id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String(500), unique=True, nullable=False)
+    # Hex SHA-256 digest of the token, see hotel_api.token_cache.token_digest
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
     blacklisted_on = db.Column(db.DateTime)
     expires_at = db.Column(db.DateTime, nullable=False)
 
     def __init__(self, token, expires_at):
         self.created_date = datetime.now()
         self.last_modified_date = datetime.now()
-        self.token = token
+        self.token_hash = token_digest(token)
         self.expires_at = datetime.fromtimestamp(expires_at)
 
     def __repr__(self):
-        return f"<BlacklistToken token={self.token}>"
+        return f"<BlacklistToken token_hash={self.token_hash}>"
 
     def add(self):
         db.session.add(self)
         db.session.commit()
 
+        token_blacklist.add(self.token_hash, self.expires_at)
+        token_cache.discard(self.token_hash)
+
         return None
 
     @classmethod
     def check_blacklist(cls, token):
-        exists = cls.query.filter_by(token=token).first()
+        exists = cls.query.filter_by(token_hash=token_digest(token)).first()
         return True if exists else False
 
+    @classmethod
+    def blacklisted_since(cls, last_id):
+        """Return (id, token_hash, expires_at) of unexpired rows after last_id."""
+        return (
+            db.session.query(cls.id, cls.token_hash, cls.expires_at)
+            .filter(cls.id > last_id, cls.expires_at > datetime.now())
+            .all()
+        )
+
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """
+        Delete expired tokens in batches of batch_size, committing each batch.
+
+        Batches lock their rows with SKIP LOCKED so several sweepers can run at
+        once without waiting on each other. Returns the number of rows deleted.
+        """
+        purged = 0
+        while True:
+            expired = (
+                db.session.query(cls.id)
+                .filter(cls.expires_at <= datetime.now())
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .subquery()
+            )
+            result = db.session.execute(
+                cls.__table__.delete().where(cls.id.in_(db.select([expired.c.id])))
+            )
+            db.session.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+        return purged
+
 
 class Users(BaseTable, db.Model):
     __tablename__ = "users"
@@ -58,7 +131,7 @@ class Users(BaseTable, db.Model):
     def __init__(self, user_name="", email="", password=""):
         self.user_name = user_name.lower()
         self.email = email.lower()
-        self.password = bcrypt.generate_password_hash(password).decode()
+        self.password = password_hasher.generate_password_hash(password).decode()
 
     def __repr__(self):
         return f"<User_id {self.id}, admin={self.is_admin}>"
@@ -87,17 +160,56 @@ class Users(BaseTable, db.Model):
 
         return None
 
+    # Cancels a user's open reservations and releases their inventory nights,
+    #  aggregated per (hotel, room type, night), and bumps the inventory
+    #  version of the affected hotels, in a single statement.
+    CANCEL_RESERVATIONS = text(
+        "with cancelled as ( "
+        "update hotel_api.reservations "
+        "set is_cancelled = true, last_modified_date = :now "
+        "where customer_user_id = :user_id "
+        "and not is_cancelled and not is_completed "
+        "returning hotel_id, desired_room_type, checkin_date, checkout_date "
+        "), "
+        "nights as ( "
+        "select hotel_id, desired_room_type as room_type, night, "
+        "count(*) as rooms "
+        "from cancelled "
+        "cross join lateral generate_series(cast(checkin_date as timestamp), "
+        "cast(checkout_date as timestamp) - interval '1 day', "
+        "interval '1 day') as night "
+        "group by hotel_id, desired_room_type, night "
+        "), "
+        "bumped as ( "
+        "insert into hotel_api.inventory_versions (hotel_id, version, "
+        "created_date, last_modified_date) "
+        "select hotel_id, 1, :now, :now "
+        "from (select distinct hotel_id from nights) as changed "
+        "order by hotel_id "
+        "on conflict (hotel_id) do update "
+        "set version = inventory_versions.version + 1, "
+        "last_modified_date = excluded.last_modified_date "
+        ") "
+        "update hotel_api.room_inventory i "
+        "set rooms_reserved = greatest(i.rooms_reserved - nights.rooms, 0), "
+        "last_modified_date = :now "
+        "from nights "
+        "where i.hotel_id = nights.hotel_id "
+        "and i.room_type = nights.room_type "
+        "and i.date = nights.night"
+    )
+
     def delete(self):
         """
         Deactivate user and cancel all user's outstanding reservations.
+
+        Reservations are cancelled and their inventory released set-based,
+        in the same transaction as the deactivation.
         """
+        now = datetime.now()
+        db.session.execute(Users.CANCEL_RESERVATIONS, {"user_id": self.id, "now": now})
         self.is_deactivated = True
-
-        for reservation in self.reservations:
-            if not reservation.is_cancelled:
-                reservation.delete()
-
-        self.last_modified_date = datetime.now()
+        self.last_modified_date = now
         db.session.commit()
 
         return None
@@ -124,8 +236,16 @@ class Users(BaseTable, db.Model):
     def check_password(self, password):
         """
         Check provided user password against stored user password.
+
+        A matching password stored with a bcrypt cost other than
+        BCRYPT_LOG_ROUNDS is re-hashed with the configured cost.
         """
-        return bcrypt.check_password_hash(self.password, password)
+        valid = password_hasher.check_password_hash(self.password, password)
+        if valid and password_hasher.needs_rehash(self.password):
+            self.password = password_hasher.generate_password_hash(password).decode()
+            db.session.commit()
+
+        return valid
 
     def encode_access_token(self):
         """Return JWT token with expiration, id, and role for user."""
@@ -151,19 +271,28 @@ class Users(BaseTable, db.Model):
             split = access_token.split("Bearer")
             access_token = split[1].strip()
 
-        try:
-            key = current_app.config.get("SECRET_KEY")
-            payload = jwt.decode(access_token, key, algorithms="HS256")
+        # Verified payloads are cached until they expire, so the signature is
+        #  only checked the first time this process sees a token.
+        digest = token_digest(access_token)
+        payload = token_cache.get(digest)
 
-        except jwt.exceptions.ExpiredSignatureError:
-            return dict(
-                status="Failed", message="Access token expired. Please log in again."
-            )
+        if payload is None:
+            try:
+                key = current_app.config.get("SECRET_KEY")
+                payload = jwt.decode(access_token, key, algorithms="HS256")
 
-        except jwt.exceptions.InvalidTokenError:
-            return dict(status="Failed", message="Invalid token. Please log in.")
+            except jwt.exceptions.ExpiredSignatureError:
+                return dict(
+                    status="Failed",
+                    message="Access token expired. Please log in again.",
+                )
+
+            except jwt.exceptions.InvalidTokenError:
+                return dict(status="Failed", message="Invalid token. Please log in.")
 
-        if BlacklistedTokens.check_blacklist(access_token):
+            token_cache.set(digest, payload)
+
+        if token_blacklist.contains(digest):
             return dict(
                 status="Failed", message="Token blacklisted. Please log in again."
             )
@@ -205,20 +334,14 @@ class Reservations(BaseTable, db.Model):
         return row2dict(self)
 
     def add(self):
-        available = RoomInventory.check_available(
+        reserved = RoomInventory.update_inventory(
             hotel_id=self.hotel_id,
             room_type=self.desired_room_type,
             checkin_date=self.checkin_date,
             checkout_date=self.checkout_date,
+            flag="reserve",
         )
-        if available == True:
-            RoomInventory.update_inventory(
-                hotel_id=self.hotel_id,
-                room_type=self.desired_room_type,
-                checkin_date=self.checkin_date,
-                checkout_date=self.checkout_date,
-                flag="reserve",
-            )
+        if reserved:
             db.session.add(self)
             db.session.commit()
         else:
@@ -259,36 +382,30 @@ class Reservations(BaseTable, db.Model):
                 ).intersection(diff)
             ):
                 print("new res details")
-                available = RoomInventory.check_available(
+                # Release inventory for old reservation so overlapping nights
+                #  can be reserved again. Rolled back if the new stay fails.
+                RoomInventory.update_inventory(
+                    hotel_id=self.hotel_id,
+                    room_type=self.desired_room_type,
+                    checkin_date=self.checkin_date,
+                    checkout_date=self.checkout_date,
+                    flag="release",
+                )
+                # Reserve inventory for changed reservation
+                reserved = RoomInventory.update_inventory(
                     hotel_id=args["hotel_id"],
                     room_type=args["desired_room_type"],
                     checkin_date=args["checkin_date"],
                     checkout_date=args["checkout_date"],
+                    flag="reserve",
                 )
-                if available == True:
+                if reserved:
                     print("true")
-                    # Reserve inventory for changed reservation
-                    RoomInventory.update_inventory(
-                        hotel_id=args["hotel_id"],
-                        room_type=args["desired_room_type"],
-                        checkin_date=args["checkin_date"],
-                        checkout_date=args["checkout_date"],
-                        flag="reserve",
-                    )
-                    # Release inventory for old reservation
-                    RoomInventory.update_inventory(
-                        hotel_id=self.hotel_id,
-                        room_type=self.desired_room_type,
-                        checkin_date=self.checkin_date,
-                        checkout_date=self.checkout_date,
-                        flag="release",
-                    )
                     # Update reservation to reflect changes
                     self.checkin_date = args["checkin_date"]
                     self.checkout_date = args["checkout_date"]
                     self.desired_room_type = args["desired_room_type"]
                 else:
-                    db.session.rollback()
                     abort(
                         400,
                         "Reservation change failed.\
@@ -307,8 +424,6 @@ class Reservations(BaseTable, db.Model):
         self.is_cancelled = True
         self.last_modified_date = datetime.now()
 
-        db.session.commit()
-
         RoomInventory.update_inventory(
             hotel_id=self.hotel_id,
             room_type=self.desired_room_type,
@@ -316,9 +431,116 @@ class Reservations(BaseTable, db.Model):
             checkout_date=self.checkout_date,
             flag="release",
         )
+        db.session.commit()
 
         return None
 
+    # Locked in key order so concurrent batches cannot deadlock
+    LOCK_NIGHTS = text(
+        "select ri.id, ri.hotel_id, ri.room_type, cast(ri.date as date), "
+        "ri.max_rooms_available - ri.rooms_reserved "
+        "from hotel_api.room_inventory ri "
+        "join unnest(cast(:hotel_ids as integer[]), cast(:room_types as text[]), "
+        "cast(:nights as date[])) as n(hotel_id, room_type, night) "
+        "on ri.hotel_id = n.hotel_id and ri.room_type = n.room_type "
+        "and ri.date = n.night "
+        "order by ri.hotel_id, ri.room_type, ri.date "
+        "for update of ri"
+    )
+
+    RESERVE_NIGHTS = text(
+        "update hotel_api.room_inventory ri "
+        "set rooms_reserved = ri.rooms_reserved + d.rooms, last_modified_date = :now "
+        "from unnest(cast(:ids as integer[]), cast(:rooms as integer[])) "
+        "as d(id, rooms) "
+        "where ri.id = d.id"
+    )
+
+    @staticmethod
+    def add_batch(stays, all_or_nothing=True):
+        """
+        Reserve inventory for many stays and add their reservations in one
+        transaction.
+
+        Every inventory night the stays need is locked and read with one
+        query. Stays are then accepted in order while each of their nights
+        still has a room left. Accepted stays are reserved with one UPDATE
+        and added with one multi-row INSERT. With all_or_nothing a single
+        stay that does not fit rejects the whole batch.
+
+        :param stays: List of dicts with hotel_id, desired_room_type,
+            checkin_date, checkout_date, guest_full_name and customer_user_id
+        :param all_or_nothing: Reject every stay if any stay does not fit
+        :return: A list telling whether each stay fits and a list with the
+            added reservation dict of each stay, or None if it was not added
+        """
+        now = datetime.now()
+        nights = [
+            [
+                (stay["hotel_id"], stay["desired_room_type"], night)
+                for night in daterange(stay["checkin_date"], stay["checkout_date"])
+            ]
+            for stay in stays
+        ]
+        keys = sorted({key for stay_nights in nights for key in stay_nights})
+        locked = db.session.execute(
+            Reservations.LOCK_NIGHTS,
+            {
+                "hotel_ids": [hotel_id for hotel_id, _, _ in keys],
+                "room_types": [room_type for _, room_type, _ in keys],
+                "nights": [night for _, _, night in keys],
+            },
+        )
+        inventory_ids, free = {}, {}
+        for id, hotel_id, room_type, night, rooms in locked:
+            inventory_ids[(hotel_id, room_type, night)] = id
+            free[(hotel_id, room_type, night)] = rooms
+
+        reserved = Counter()
+        accepted = []
+        for stay_nights in nights:
+            fits = bool(stay_nights) and all(
+                free.get(key, 0) - reserved[key] > 0 for key in stay_nights
+            )
+            if fits:
+                reserved.update(stay_nights)
+            accepted.append(fits)
+        if not any(accepted) or (all_or_nothing and not all(accepted)):
+            db.session.rollback()
+            return accepted, [None] * len(stays)
+
+        db.session.execute(
+            Reservations.RESERVE_NIGHTS,
+            {
+                "ids": [inventory_ids[key] for key in reserved],
+                "rooms": list(reserved.values()),
+                "now": now,
+            },
+        )
+        table = Reservations.__table__
+        added = db.session.execute(
+            table.insert()
+            .values(
+                [
+                    dict(
+                        stay,
+                        is_cancelled=False,
+                        is_completed=False,
+                        created_date=now,
+                        last_modified_date=now,
+                    )
+                    for stay, fits in zip(stays, accepted)
+                    if fits
+                ]
+            )
+            .returning(*table.columns)
+        )
+        added = iter([dict(row) for row in added])
+        InventoryVersions.bump({hotel_id for hotel_id, _, _ in reserved})
+        db.session.commit()
+
+        return accepted, [next(added) if fits else None for fits in accepted]
+
 
 class Hotels(BaseTable, db.Model):
     __tablename__ = "hotels"
@@ -329,14 +551,20 @@ class Hotels(BaseTable, db.Model):
     astrd_diameter = db.Column(db.Float, nullable=False)
     astrd_surface_composition = db.Column(db.String, nullable=True)
     ephem_data = db.Column(db.String, nullable=False)
+    # Rooms and inventory are removed by ON DELETE CASCADE, never loaded for it
     rooms = db.relationship(
-        "Rooms", backref="hotels", lazy=True, cascade="all, delete-orphan"
+        "Rooms",
+        backref="hotels",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     room_inventory = db.relationship(
         "RoomInventory",
         backref="room_inventory",
         lazy=True,
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def __repr__(self):
@@ -359,14 +587,12 @@ class Hotels(BaseTable, db.Model):
             db.session.rollback()
             abort(400, "Hotel already exists.")
         # add all rooms to rooms table
-        rooms = Rooms.create_rooms(
+        Rooms.bulk_add_rooms(
             hotel_id=self.id,
             double_rooms=total_double_rooms,
             queen_rooms=total_queen_rooms,
             king_rooms=total_king_rooms,
         )
-        db.session.add_all(rooms)
-        db.session.commit()
         RoomInventory.bulk_add_inventory(
             hotel_id=self.id,
             max_double_capactiy=total_double_rooms,
@@ -375,28 +601,16 @@ class Hotels(BaseTable, db.Model):
             start_date=date.today(),
             end_date=months_out(date.today(), inv_months),
         )
+        db.session.commit()
 
     def get_room_counts(self):
         """Return counts of double, queen, and king rooms."""
         rooms = (
-            db.session.query(func.count(Rooms.type), Rooms.type)
-            .group_by(Rooms.type)
-            .order_by(Rooms.type)
+            db.session.query(*Rooms.count_columns())
             .filter(Rooms.hotel_id == self.id)
-            .all()
+            .one()
         )
-        if rooms == []:  # Newly created hotels will not have rooms
-            return {
-                "total_double_rooms": 0,
-                "total_queen_rooms": 0,
-                "total_king_rooms": 0,
-            }
-        else:
-            return {
-                "total_double_rooms": rooms[0][0],
-                "total_queen_rooms": rooms[2][0],
-                "total_king_rooms": rooms[1][0],
-            }
+        return rooms._asdict()
 
     @staticmethod
     def update_hotel(id, args):
@@ -406,71 +620,22 @@ class Hotels(BaseTable, db.Model):
         if len(diff) == 0:
             return hotel
         else:
-            for k in diff:  # Specific action for each key
-                if k == "name":
-                    hotel["objects"].name = args["name"]
-                # TODO: refactoring needed below
-                elif k == "total_double_rooms":
-                    room_diff = (
-                        args["total_double_rooms"]
-                        - hotel["fields"]["total_double_rooms"]
-                    )
-                    if room_diff < 0:
-                        db.session.rollback()
-                        abort(
-                            400, "Hotel room counts cannot shrink. They can only grow."
-                        )
-                    else:
-                        new_rooms = [
-                            Rooms(
-                                hotel_id=id,
-                                created_date=datetime.now(),
-                                last_modified_date=datetime.now(),
-                                type="double",
-                            )
-                            for n in range(room_diff)
-                        ]
-                        db.session.add_all(new_rooms)
-                elif k == "total_queen_rooms":
-                    room_diff = (
-                        args["total_queen_rooms"] - hotel["fields"]["total_queen_rooms"]
-                    )
-                    if room_diff < 0:
-                        db.session.rollback()
-                        abort(
-                            400, "Hotel room counts cannot shrink. They can only grow."
-                        )
-                    else:
-                        new_rooms = [
-                            Rooms(
-                                hotel_id=id,
-                                created_date=datetime.now(),
-                                last_modified_date=datetime.now(),
-                                type="queen",
-                            )
-                            for n in range(room_diff)
-                        ]
-                        db.session.add_all(new_rooms)
-                elif k == "total_king_rooms":
-                    room_diff = (
-                        args["total_king_rooms"] - hotel["fields"]["total_king_rooms"]
-                    )
-                    if room_diff < 0:
-                        db.session.rollback()
-                        abort(
-                            400, "Hotel room counts cannot shrink. They can only grow."
-                        )
-                    else:
-                        new_rooms = [
-                            Rooms(
-                                hotel_id=id,
-                                created_date=datetime.now(),
-                                last_modified_date=datetime.now(),
-                                type="king",
-                            )
-                            for n in range(room_diff)
-                        ]
-                        db.session.add_all(new_rooms)
+            if "name" in diff:
+                hotel["objects"].name = args["name"]
+            new_rooms = {
+                room_type: args[f"total_{room_type}_rooms"]
+                - hotel["fields"][f"total_{room_type}_rooms"]
+                for room_type in ("double", "queen", "king")
+            }
+            if any(n < 0 for n in new_rooms.values()):
+                db.session.rollback()
+                abort(400, "Hotel room counts cannot shrink. They can only grow.")
+            Rooms.bulk_add_rooms(
+                hotel_id=id,
+                double_rooms=new_rooms["double"],
+                queen_rooms=new_rooms["queen"],
+                king_rooms=new_rooms["king"],
+            )
             hotel["objects"].last_modified_date = datetime.now()
             db.session.commit()
             RoomInventory.bulk_update_inventory(hotel_id=id)
@@ -479,23 +644,52 @@ class Hotels(BaseTable, db.Model):
 
     @staticmethod
     def delete_hotel(id):
-        """Delete a hotel from the database."""
-        hotel = Hotels.query.get_or_404(id)
-        db.session.delete(hotel)
+        """
+        Delete a hotel from the database.
+
+        Its rooms and inventory are deleted by the database through ON DELETE
+        CASCADE, so none of them are loaded into the session.
+        """
+        deleted = (
+            db.session.query(Hotels)
+            .filter(Hotels.id == id)
+            .delete(synchronize_session=False)
+        )
+        if not deleted:
+            db.session.rollback()
+            abort(404)
+        InventoryVersions.bump([id])
         db.session.commit()
-        # RoomInventory.bulk_delete_inventory(hotel_id=hotel.id)
 
     @staticmethod
-    def get_hotels():
-        """Return a list of hotels with room counts from the database."""
-        hotels = Hotels.query.all()
-        hotel_list = []
-        for hotel in hotels:
-            rooms = hotel.get_room_counts()
-            hotel = row2dict(hotel)
-            hotel = {**hotel, **rooms}  # merge dictionaries
-            hotel_list.append(hotel)
-        return {"fields": hotel_list, "objects": hotels}
+    def with_room_counts():
+        """Return a query of hotel columns and room counts, one row per hotel."""
+        room_counts = (
+            db.session.query(Rooms.hotel_id, *Rooms.count_columns())
+            .group_by(Rooms.hotel_id)
+            .subquery()
+        )
+        count_keys = ("total_double_rooms", "total_queen_rooms", "total_king_rooms")
+        return db.session.query(
+            *Hotels.__table__.columns,
+            *[func.coalesce(room_counts.c[key], 0).label(key) for key in count_keys],
+        ).outerjoin(room_counts, room_counts.c.hotel_id == Hotels.id)
+
+    @staticmethod
+    def get_hotels(after=None, limit=None):
+        """
+        Return a list of hotels with room counts from the database.
+
+        When limit is given only the page of hotels with ids greater than
+        after is returned, plus one look-ahead hotel to detect a next page.
+        """
+        rows = Hotels.with_room_counts()
+        if limit is None:
+            rows = rows.order_by(Hotels.id).all()
+        else:
+            rows = keyset_page(rows, Hotels.id, after, limit).all()
+        hotel_list = [row._asdict() for row in rows]
+        return {"fields": hotel_list, "objects": rows}
 
     @staticmethod
     def get_hotel(id):
@@ -515,10 +709,17 @@ class Hotels(BaseTable, db.Model):
 
 class Rooms(BaseTable, db.Model):
     __tablename__ = "rooms"
+    __table_args__ = (
+        # Serves room counts per hotel and type
+        db.Index("ix_rooms_hotel_id_type", "hotel_id", "type"),
+        BaseTable.__table_args__,
+    )
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String, nullable=False)
     hotel_id = db.Column(
-        db.Integer, db.ForeignKey("hotel_api.hotels.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("hotel_api.hotels.id", ondelete="CASCADE"),
+        nullable=False,
     )
 
     def __repr__(self):
@@ -531,33 +732,79 @@ class Rooms(BaseTable, db.Model):
         return row2dict(self)
 
     @staticmethod
-    def create_rooms(hotel_id, double_rooms, queen_rooms, king_rooms):
-        """Return an array of rooms instances."""
-        args = {
-            "hotel_id": hotel_id,
-            "created_date": datetime.now(),
-            "last_modified_date": datetime.now(),
-        }
-        rooms = []
-        for room in range(double_rooms):
-            room = Rooms(type="double", **args)
-            rooms.append(room)
-        for room in range(queen_rooms):
-            room = Rooms(type="queen", **args)
-            rooms.append(room)
-        for room in range(king_rooms):
-            room = Rooms(type="king", **args)
-            rooms.append(room)
-        return rooms
+    def count_columns():
+        """Return labeled conditional counts of double, queen, and king rooms."""
+        return (
+            func.count(Rooms.id)
+            .filter(Rooms.type == "double")
+            .label("total_double_rooms"),
+            func.count(Rooms.id)
+            .filter(Rooms.type == "queen")
+            .label("total_queen_rooms"),
+            func.count(Rooms.id).filter(Rooms.type == "king").label("total_king_rooms"),
+        )
+
+    # n rooms of each type in a single statement
+    GENERATE_ROOMS = text(
+        "insert into hotel_api.rooms (type, hotel_id, created_date, "
+        "last_modified_date) "
+        "select rooms.room_type, :hotel_id, :now, :now "
+        "from (values ('double', cast(:double as integer)), "
+        "('queen', cast(:queen as integer)), ('king', cast(:king as integer))) "
+        "as rooms(room_type, n) "
+        "cross join lateral generate_series(1, rooms.n)"
+    )
+
+    @staticmethod
+    def bulk_add_rooms(hotel_id, double_rooms, queen_rooms, king_rooms):
+        """
+        Add rooms of each type to a hotel without creating ORM instances.
+
+        Runs in the current session; the caller commits.
+        """
+        if double_rooms + queen_rooms + king_rooms == 0:
+            return None
+        db.session.execute(
+            Rooms.GENERATE_ROOMS,
+            {
+                "hotel_id": hotel_id,
+                "double": double_rooms,
+                "queen": queen_rooms,
+                "king": king_rooms,
+                "now": datetime.now(),
+            },
+        )
+
+        return None
 
 
 class RoomInventory(BaseTable, db.Model):
     __tablename__ = "room_inventory"
+    __table_args__ = (
+        # Natural key of an inventory night, also serves per hotel lookups
+        db.Index(
+            "uq_room_inventory_hotel_room_type_date",
+            "hotel_id",
+            "room_type",
+            "date",
+            unique=True,
+        ),
+        # Only nights with free rooms, for availability searches by date range
+        db.Index(
+            "ix_room_inventory_free_date",
+            "date",
+            "room_type",
+            "hotel_id",
+            postgresql_where=text("max_rooms_available - rooms_reserved > 0"),
+        ),
+        BaseTable.__table_args__,
+    )
     id = db.Column(db.Integer, primary_key=True)
-    # TODO: These are no longer primary keys
     date = db.Column(db.DateTime, nullable=False)
     hotel_id = db.Column(
-        db.Integer, db.ForeignKey("hotel_api.hotels.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("hotel_api.hotels.id", ondelete="CASCADE"),
+        nullable=False,
     )
     room_type = db.Column(db.String, nullable=False)
     max_rooms_available = db.Column(db.Integer, nullable=False)
@@ -572,6 +819,19 @@ class RoomInventory(BaseTable, db.Model):
         """
         return row2dict(self)
 
+    # One row per night in [first_night, end_date) and room type
+    GENERATE_INVENTORY = text(
+        "insert into hotel_api.room_inventory (date, hotel_id, room_type, "
+        "max_rooms_available, rooms_reserved, created_date, last_modified_date) "
+        "select night, :hotel_id, capacity.room_type, capacity.max_rooms, 0, "
+        ":now, :now "
+        "from generate_series(cast(:first_night as date), "
+        "cast(:end_date as date) - 1, interval '1 day') as night "
+        "cross join (values ('double', cast(:double as integer)), "
+        "('queen', cast(:queen as integer)), ('king', cast(:king as integer))) "
+        "as capacity(room_type, max_rooms)"
+    )
+
     @staticmethod
     def bulk_add_inventory(
         hotel_id,
@@ -581,28 +841,121 @@ class RoomInventory(BaseTable, db.Model):
         start_date,
         end_date,
     ):
-        """Add hotel room inventory in bulk for n number of months."""
-        room_types = {
-            "double": max_double_capactiy,
-            "queen": max_queen_capactiy,
-            "king": max_king_capacity,
-        }
-        created_date = datetime.now()
-        last_modified_date = datetime.now()
-        room_inventory = []
-        for date in daterange(start_date, end_date):
-            for k, v in room_types.items():
-                room_type = dict(
-                    created_date=created_date,
-                    last_modified_date=last_modified_date,
-                    date=date,
-                    hotel_id=hotel_id,
-                    room_type=k,
-                    max_rooms_available=v,
-                    rooms_reserved=0,
-                )
-                room_inventory.append(room_type)
-        db.engine.execute(RoomInventory.__table__.insert().values(room_inventory))
+        """
+        Add hotel room inventory in bulk for n number of months.
+
+        The calendar is generated server side with generate_series, one
+        INSERT ... SELECT per INVENTORY_CHUNK_DAYS nights, so neither the
+        statement nor this process grows with the length of the horizon.
+        Runs in the current session; the caller commits.
+        """
+        chunk_days = current_app.config["INVENTORY_CHUNK_DAYS"]
+        now = datetime.now()
+        chunk_start = start_date
+        while chunk_start < end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days), end_date)
+            db.session.execute(
+                RoomInventory.GENERATE_INVENTORY,
+                {
+                    "hotel_id": hotel_id,
+                    "first_night": chunk_start,
+                    "end_date": chunk_end,
+                    "double": max_double_capactiy,
+                    "queen": max_queen_capactiy,
+                    "king": max_king_capacity,
+                    "now": now,
+                },
+            )
+            chunk_start = chunk_end
+        InventoryVersions.bump([hotel_id])
+
+        return None
+
+    # Appends the nights after each (hotel, room type)'s last inventory night,
+    #  up to end_date, for one batch of hotels, bumps the inventory version of
+    #  the hotels that got nights and returns the number of nights added.
+    #  Capacity is the hotel's current room count of that type.
+    EXTEND_HORIZON = text(
+        "with batch as ( "
+        "select id from hotel_api.hotels where id > :after and id <= :last_id "
+        "), "
+        "capacity as ( "
+        "select b.id as hotel_id, rt.room_type, count(r.id) as max_rooms "
+        "from batch b "
+        "cross join (values ('double'), ('queen'), ('king')) as rt(room_type) "
+        "left join hotel_api.rooms r "
+        "on r.hotel_id = b.id and r.type = rt.room_type "
+        "group by b.id, rt.room_type "
+        "), "
+        "inserted as ( "
+        "insert into hotel_api.room_inventory (date, hotel_id, room_type, "
+        "max_rooms_available, rooms_reserved, created_date, last_modified_date) "
+        "select night, c.hotel_id, c.room_type, c.max_rooms, 0, :now, :now "
+        "from capacity c "
+        "cross join lateral ( "
+        "select max(i.date) as last_night from hotel_api.room_inventory i "
+        "where i.hotel_id = c.hotel_id and i.room_type = c.room_type "
+        ") l "
+        "cross join lateral generate_series( "
+        "greatest(cast(l.last_night as date) + 1, cast(:today as date)), "
+        "cast(:end_date as date) - 1, interval '1 day') as night "
+        "on conflict (hotel_id, room_type, date) do nothing "
+        "returning hotel_id "
+        "), "
+        "bumped as ( "
+        "insert into hotel_api.inventory_versions (hotel_id, version, "
+        "created_date, last_modified_date) "
+        "select hotel_id, 1, :now, :now "
+        "from (select distinct hotel_id from inserted) as changed "
+        "order by hotel_id "
+        "on conflict (hotel_id) do update "
+        "set version = inventory_versions.version + 1, "
+        "last_modified_date = excluded.last_modified_date "
+        ") "
+        "select count(*) from inserted"
+    )
+
+    @staticmethod
+    def extend_horizon(end_date, batch_size=1000):
+        """
+        Extend every hotel's inventory up to (but excluding) end_date.
+
+        Hotels are processed in id order, batch_size hotels per statement and
+        transaction. Only nights after a hotel's last inventory night are
+        added and existing nights are left alone, so the job can be re-run or
+        resumed after a failure at any point.
+
+        :param end_date: First night that should not be bookable yet
+        :param batch_size: Hotels handled per statement
+        :return: Number of inventory rows added
+        """
+        added = 0
+        after = 0
+        while True:
+            batch = [
+                row.id
+                for row in db.session.query(Hotels.id)
+                .filter(Hotels.id > after)
+                .order_by(Hotels.id)
+                .limit(batch_size)
+            ]
+            if not batch:
+                break
+            result = db.session.execute(
+                RoomInventory.EXTEND_HORIZON,
+                {
+                    "after": after,
+                    "last_id": batch[-1],
+                    "today": date.today(),
+                    "end_date": end_date,
+                    "now": datetime.now(),
+                },
+            )
+            added += result.scalar()
+            db.session.commit()
+            after = batch[-1]
+
+        return added
 
     @staticmethod
     def bulk_update_inventory(hotel_id):
@@ -626,33 +979,46 @@ class RoomInventory(BaseTable, db.Model):
                 )
                 .values(max_rooms_available=v, last_modified_date=last_modified_date)
             )
-            db.engine.execute(stmt)
+            db.session.execute(stmt)
+        InventoryVersions.bump([hotel_id])
+        db.session.commit()
 
     @staticmethod
     def bulk_delete_inventory(hotel_id):
         """Delete all inventory for a given hotel."""
         table = RoomInventory.__table__
         stmt = table.delete().where(table.columns.hotel_id == hotel_id)
-        db.engine.execute(stmt)
+        db.session.execute(stmt)
+        InventoryVersions.bump([hotel_id])
+        db.session.commit()
 
     # TODO: update_inventory (when a reservation is made / altered / cancelled)
 
     @staticmethod
-    def check_available(hotel_id, room_type, checkin_date, checkout_date):
-        """Check that inventory is available for given data range and room type."""
+    def stay_filter(hotel_id, room_type, checkin_date, checkout_date):
+        """Return filter clauses selecting the inventory nights of a stay."""
         last_night = checkout_date - timedelta(days=1)
 
+        return (
+            RoomInventory.hotel_id == hotel_id,
+            RoomInventory.room_type == room_type,
+            RoomInventory.date.between(
+                checkin_date.isoformat(), last_night.isoformat()
+            ),
+        )
+
+    @staticmethod
+    def check_available(hotel_id, room_type, checkin_date, checkout_date):
+        """Check that inventory is available for given data range and room type."""
         dates = (
             db.session.query(
                 RoomInventory.date,
                 RoomInventory.max_rooms_available - RoomInventory.rooms_reserved,
             )
             .filter(
-                RoomInventory.hotel_id == hotel_id,
-                RoomInventory.room_type == room_type,
-                RoomInventory.date.between(
-                    checkin_date.isoformat(), last_night.isoformat()
-                ),
+                *RoomInventory.stay_filter(
+                    hotel_id, room_type, checkin_date, checkout_date
+                )
             )
             .all()
         )
@@ -666,27 +1032,349 @@ class RoomInventory(BaseTable, db.Model):
         else:
             return None
 
+    @staticmethod
+    def calendar(hotel_id, start_date, end_date, room_types):
+        """
+        Return the free rooms of a hotel on each night in [start_date, end_date).
+
+        One range query on the (hotel_id, room_type, date) index. Nights
+        without inventory count as no free rooms. Aborts with 404 if the hotel
+        does not exist.
+
+        :return: Dict of room type to a list with the free rooms of each night
+        """
+        free = {
+            room_type: [0] * (end_date - start_date).days for room_type in room_types
+        }
+        nights = db.session.query(
+            RoomInventory.date,
+            RoomInventory.room_type,
+            RoomInventory.max_rooms_available - RoomInventory.rooms_reserved,
+        ).filter(
+            RoomInventory.hotel_id == hotel_id,
+            RoomInventory.room_type.in_(room_types),
+            RoomInventory.date >= start_date,
+            RoomInventory.date < end_date,
+        )
+        found = False
+        for night, room_type, rooms in nights:
+            free[room_type][(night.date() - start_date).days] = rooms
+            found = True
+
+        if not found and Hotels.version(hotel_id) is None:
+            abort(404)
+
+        return free
+
     @staticmethod
     def update_inventory(hotel_id, room_type, checkin_date, checkout_date, flag):
-        """Reserve or free room inventory for a single reservation."""
-        last_night = checkout_date - timedelta(days=1)
+        """
+        Reserve or free room inventory for a single reservation.
 
-        dates = (
-            db.session.query(RoomInventory)
-            .filter(
-                RoomInventory.hotel_id == hotel_id,
-                RoomInventory.room_type == room_type,
-                RoomInventory.date.between(
-                    checkin_date.isoformat(), last_night.isoformat()
-                ),
+        All nights of the stay are changed by one UPDATE in the current
+        transaction, which the caller commits. Reserving only matches nights
+        with a free room, so concurrent bookings for the last room serialize
+        on the row locks and the loser matches fewer nights than it needs.
+        In that case the transaction is rolled back and False is returned.
+        """
+        table = RoomInventory.__table__
+        nights = (checkout_date - checkin_date).days
+        stay = RoomInventory.stay_filter(
+            hotel_id, room_type, checkin_date, checkout_date
+        )
+
+        if flag == "reserve":
+            stmt = (
+                table.update()
+                .where(
+                    and_(
+                        *stay,
+                        table.c.max_rooms_available - table.c.rooms_reserved > 0,
+                    )
+                )
+                .values(
+                    rooms_reserved=table.c.rooms_reserved + 1,
+                    last_modified_date=datetime.now(),
+                )
             )
-            .all()
+        else:  # release inventory
+            stmt = (
+                table.update()
+                .where(and_(*stay, table.c.rooms_reserved > 0))
+                .values(
+                    rooms_reserved=table.c.rooms_reserved - 1,
+                    last_modified_date=datetime.now(),
+                )
+            )
+        result = db.session.execute(stmt)
+
+        if flag == "reserve" and (nights < 1 or result.rowcount != nights):
+            db.session.rollback()
+            return False
+        InventoryVersions.bump([hotel_id])
+
+        return True
+
+
+class InventoryVersions(BaseTable, db.Model):
+    """
+    Per hotel counter bumped in the same transaction as every change to the
+    hotel's room inventory, so cached availability can be checked cheaply.
+
+    There is no foreign key to hotels: a deleted hotel keeps its row, which
+    is bumped by the delete. Counters only grow, so the (hotel, counter)
+    pairs of a set of hotels change whenever any of them is changed.
+    """
+
+    __tablename__ = "inventory_versions"
+    hotel_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False)
+
+    # Rows are locked in hotel id order so concurrent bumps cannot deadlock
+    BUMP = text(
+        "insert into hotel_api.inventory_versions (hotel_id, version, "
+        "created_date, last_modified_date) "
+        "select hotel_id, 1, :now, :now "
+        "from (select distinct unnest(cast(:hotel_ids as integer[])) as hotel_id) "
+        "as changed "
+        "order by hotel_id "
+        "on conflict (hotel_id) do update "
+        "set version = inventory_versions.version + 1, "
+        "last_modified_date = excluded.last_modified_date"
+    )
+
+    @staticmethod
+    def bump(hotel_ids):
+        """
+        Bump the inventory version of each hotel in the current transaction.
+
+        :param hotel_ids: Ids of the hotels whose inventory changed
+        :return: None
+        """
+        db.session.execute(
+            InventoryVersions.BUMP,
+            {"hotel_ids": list(hotel_ids), "now": datetime.now()},
+        )
+
+        return None
+
+    # Every hotel matching the filters, with version 0 if it was never
+    #  bumped, and every deleted hotel. Hashing the (id, version) pairs makes
+    #  the signature change when the set of hotels changes, not only when
+    #  the total of their versions does.
+    SIGNATURE = read_only(
+        text(
+            "select md5(coalesce(string_agg("
+            "coalesce(h.id, v.hotel_id) || ':' || coalesce(v.version, 0), ',' "
+            "order by coalesce(h.id, v.hotel_id)), '')) "
+            "from hotel_api.hotels h "
+            "full join hotel_api.inventory_versions v on v.hotel_id = h.id "
+            "where h.id is null "
+            "or ((cast(:names as text[]) is null "
+            "or h.name = any(cast(:names as text[]))) "
+            "and (cast(:surface_types as text[]) is null "
+            "or h.astrd_surface_composition = any(cast(:surface_types as text[]))))"
+        )
+    )
+
+    @staticmethod
+    def signature(names=None, surface_types=None):
+        """
+        Return a digest of the inventory versions of every hotel a search
+        with the given filters could return, plus every deleted hotel.
+
+        :param names: Optional list of hotel names searched for
+        :param surface_types: Optional list of surface compositions searched for
+        :return: Hex digest that changes whenever any of those hotels changes,
+            or a hotel starts or stops matching the filters
+        """
+        return db.session.execute(
+            InventoryVersions.SIGNATURE,
+            {"names": names or None, "surface_types": surface_types or None},
+        ).scalar()
+
+    @staticmethod
+    def versions():
+        """
+        Return the inventory version of every hotel that has one.
+
+        :return: Dict of hotel id to version
+        """
+        return dict(
+            db.session.query(InventoryVersions.hotel_id, InventoryVersions.version)
+        )
+
+    @staticmethod
+    def hotel_version(hotel_id):
+        """
+        Return (last_modified_date, version) of a hotel's inventory, with
+        (None, 0) for a hotel whose inventory was never bumped, or None if
+        the hotel does not exist.
+        """
+        version = (
+            db.session.query(
+                InventoryVersions.last_modified_date, InventoryVersions.version
+            )
+            .select_from(Hotels)
+            .outerjoin(InventoryVersions, InventoryVersions.hotel_id == Hotels.id)
+            .filter(Hotels.id == hotel_id)
+            .first()
+        )
+        if version is None:
+            return None
+        last_modified_date, version = version
+
+        return last_modified_date, version or 0
+
+
+class HotelEphemeris(db.Model):
+    """
+    Position of each hotel's asteroid at 00:00 UTC on every day of the
+    inventory horizon, precomputed by ``hotel_api ephemeris precompute``.
+
+    Angles are in radians and distances in AU, stored as 4 byte reals. Rows
+    have no created or modified dates to keep the table compact; when and
+    from which ephem_data a hotel's rows were computed is kept once per hotel
+    in HotelEphemerisSources.
+    """
+
+    __tablename__ = "hotel_ephemeris"
+    __table_args__ = BaseTable.__table_args__
+    hotel_id = db.Column(
+        db.Integer,
+        db.ForeignKey("hotel_api.hotels.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    date = db.Column(db.Date, primary_key=True)
+    hlon = db.Column(db.REAL, nullable=False)
+    hlat = db.Column(db.REAL, nullable=False)
+    sun_distance = db.Column(db.REAL, nullable=False)
+    ra = db.Column(db.REAL, nullable=False)
+    dec = db.Column(db.REAL, nullable=False)
+    earth_distance = db.Column(db.REAL, nullable=False)
+
+    # Only rows computed from the very ephem_data the caller holds, which may
+    #  be older or newer than the hotel's row
+    EARTH_DISTANCES = read_only(
+        text(
+            "select c.ephem_data, e.earth_distance "
+            "from unnest(cast(:hotel_ids as integer[]), "
+            "cast(:ephem_data as text[])) as c(hotel_id, ephem_data) "
+            "join hotel_api.hotel_ephemeris_sources s on s.hotel_id = c.hotel_id "
+            "and s.ephem_digest = md5(c.ephem_data) "
+            "join hotel_api.hotel_ephemeris e on e.hotel_id = c.hotel_id "
+            "and e.date = :day"
+        )
+    )
+
+    @staticmethod
+    def earth_distances(hotels, day):
+        """
+        Return precomputed Earth distances of hotels' asteroids on a day.
+
+        :param hotels: List of (hotel_id, ephem_data)
+        :param day: Date of the positions
+        :return: Dict of ephem_data to distance in AU, without hotels whose
+            positions were not precomputed from that ephem_data
+        """
+        if not hotels:
+            return {}
+        hotel_ids, ephem_data = zip(*hotels)
+        return dict(
+            db.session.execute(
+                HotelEphemeris.EARTH_DISTANCES,
+                {
+                    "hotel_ids": list(hotel_ids),
+                    "ephem_data": list(ephem_data),
+                    "day": day,
+                },
+            )
+        )
+
+
+class HotelEphemerisSources(BaseTable, db.Model):
+    """
+    Digest of the ephem_data a hotel's HotelEphemeris rows were computed
+    from and the last day computed, so precomputing only adds new days and
+    redoes hotels whose ephem_data changed.
+    """
+
+    __tablename__ = "hotel_ephemeris_sources"
+    hotel_id = db.Column(
+        db.Integer,
+        db.ForeignKey("hotel_api.hotels.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    ephem_digest = db.Column(db.String(32), nullable=False)
+    computed_through = db.Column(db.Date, nullable=False)
+
+    # Hotels whose positions are missing days before :end_date, or stale
+    STALE = text(
+        "select h.id, h.ephem_data, "
+        "s.ephem_digest is distinct from md5(h.ephem_data) as changed, "
+        "s.computed_through "
+        "from hotel_api.hotels h "
+        "left join hotel_api.hotel_ephemeris_sources s on s.hotel_id = h.id "
+        "where s.hotel_id is null or s.ephem_digest <> md5(h.ephem_data) "
+        "or s.computed_through < cast(:end_date as date) - 1 "
+        "order by h.id"
+    )
+
+    UPSERT = text(
+        "insert into hotel_api.hotel_ephemeris_sources (hotel_id, ephem_digest, "
+        "computed_through, created_date, last_modified_date) "
+        "select hotel_id, md5(ephem_data), :computed_through, :now, :now "
+        "from unnest(cast(:hotel_ids as integer[]), cast(:ephem_data as text[])) "
+        "as computed(hotel_id, ephem_data) "
+        "order by hotel_id "
+        "on conflict (hotel_id) do update "
+        "set ephem_digest = excluded.ephem_digest, "
+        "computed_through = excluded.computed_through, "
+        "last_modified_date = excluded.last_modified_date"
+    )
+
+    @staticmethod
+    def stale(first_day, end_date):
+        """
+        Return the positions each hotel is missing in [first_day, end_date).
+
+        :return: List of (hotel_id, ephem_data, changed, start) where changed
+            hotels must have their rows replaced and start is the first day
+            to compute
+        """
+        stale = []
+        for hotel_id, ephem_data, changed, computed_through in db.session.execute(
+            HotelEphemerisSources.STALE, {"end_date": end_date}
+        ):
+            start = first_day
+            if not changed:
+                start = max(first_day, computed_through + timedelta(days=1))
+            stale.append((hotel_id, ephem_data, changed, start))
+
+        return stale
+
+    @staticmethod
+    def record(hotels, computed_through):
+        """
+        Record the ephem_data hotels' positions were computed from.
+
+        Runs in the current session; the caller commits.
+
+        :param hotels: List of (hotel_id, ephem_data)
+        :param computed_through: Last day computed
+        """
+        if not hotels:
+            return None
+        hotel_ids, ephem_data = zip(*hotels)
+        db.session.execute(
+            HotelEphemerisSources.UPSERT,
+            {
+                "hotel_ids": list(hotel_ids),
+                "ephem_data": list(ephem_data),
+                "computed_through": computed_through,
+                "now": datetime.now(),
+            },
         )
-        for _date in dates:
-            if flag == "reserve":
-                _date.rooms_reserved += 1
-            else:  # release inventory
-                _date.rooms_reserved -= 1
-        db.session.commit()
 
         return None
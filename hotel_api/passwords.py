@@ -0,0 +1,64 @@
+"""Password hashing with a cap on concurrent bcrypt work."""
+import threading
+from contextlib import contextmanager
+
+from flask import abort
+
+
+class PasswordHasher(object):
+    """
+    Run flask_bcrypt hashing and checks, at most BCRYPT_POOL_SIZE at a time.
+
+    Hashing runs on the calling thread, so the request waits for it either
+    way; the limit caps how many cores one process spends on bcrypt under a
+    login storm. A hash that cannot start within BCRYPT_QUEUE_TIMEOUT_SECONDS
+    is refused with a 503 instead of queueing requests behind it. bcrypt
+    releases the GIL, so only gthread workers (GUNICORN_THREADS > 1) serve
+    other requests while a thread is hashing. Hashes are made with
+    BCRYPT_LOG_ROUNDS, which flask_bcrypt reads from the same config.
+    """
+
+    def __init__(self, bcrypt, app=None):
+        self.bcrypt = bcrypt
+        self.log_rounds = 12
+        self.queue_timeout = None
+        self._slots = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.log_rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        self.queue_timeout = app.config.get("BCRYPT_QUEUE_TIMEOUT_SECONDS", None)
+        self._slots = threading.BoundedSemaphore(app.config.get("BCRYPT_POOL_SIZE", 4))
+
+    @contextmanager
+    def _slot(self):
+        """Hold one of the BCRYPT_POOL_SIZE hashing slots, or abort with 503."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            abort(503, "Too many password checks in progress. Please try again.")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def generate_password_hash(self, password):
+        """Return a bcrypt hash of password with the configured cost."""
+        with self._slot():
+            return self.bcrypt.generate_password_hash(password, self.log_rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        """Return True if password matches the bcrypt hash."""
+        with self._slot():
+            return self.bcrypt.check_password_hash(pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """Return True if pw_hash was made with a cost other than the configured one."""
+        return self.rounds(pw_hash) != self.log_rounds
+
+    @staticmethod
+    def rounds(pw_hash):
+        """Return the cost factor of a bcrypt hash such as $2b$12$..."""
+        if isinstance(pw_hash, bytes):
+            pw_hash = pw_hash.decode("ascii")
+        return int(pw_hash.split("$")[2])
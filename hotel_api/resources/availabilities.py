@@ -1,9 +1,9 @@
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 
-from sqlalchemy import text
-from flask_restx import Namespace, Resource, reqparse, fields, marshal
+from flask import abort, current_app
+from flask_restx import Namespace, Resource, reqparse, fields, inputs, marshal
 
-from hotel_api.models import db, Hotels, RoomInventory
+from hotel_api.availability import search_available, search_flexible, with_distances
 
 availabilities_ns = Namespace("availabilities")
 
@@ -18,6 +18,17 @@ hotel_fields = availabilities_ns.model(
         "uri": fields.Url("api.hotel", example="/hotels/1"),
     },
 )
+distance_fields = availabilities_ns.clone(
+    "distance_availabilities",
+    hotel_fields,
+    {"earth_distance_au": fields.Float(example=1.9)},
+)
+
+flexible_fields = availabilities_ns.clone(
+    "flexible_availabilities",
+    hotel_fields,
+    {"checkin_dates": fields.List(fields.Date, example=["2021-03-01"])},
+)
 
 # Parse search parameters from url query string
 reqparse = reqparse.RequestParser()
@@ -47,6 +58,34 @@ reqparse.add_argument(
     action="append",
 )
 
+# Flexible searches take a window and stay length instead of exact dates
+flexible_parser = reqparse.copy()
+flexible_parser.remove_argument("checkin")
+flexible_parser.remove_argument("checkout")
+flexible_parser.add_argument(
+    "window_start",
+    type=lambda s: date.fromisoformat(s),
+    required=True,
+    location="args",
+)
+flexible_parser.add_argument(
+    "window_end", type=lambda s: date.fromisoformat(s), required=True, location="args"
+)
+flexible_parser.add_argument("nights", type=int, required=True, location="args")
+
+# Distances on the checkin date only apply to exact date searches
+reqparse.add_argument(
+    "include_distance",
+    type=inputs.boolean,
+    default=False,
+    location="args",
+    help="Include each hotel's Earth distance in AU on the checkin date.",
+)
+reqparse.add_argument(
+    "sort", type=str, default="id", choices=["id", "distance"], location="args"
+)
+reqparse.add_argument("max_distance_au", type=float, required=False, location="args")
+
 
 class Availabilities(Resource):
     def __init__(self, *args, **kwargs):
@@ -54,68 +93,62 @@ class Availabilities(Resource):
         super(Availabilities, self).__init__(*args, **kwargs)
 
     @availabilities_ns.expect(reqparse)
-    @availabilities_ns.marshal_with(hotel_fields)
+    @availabilities_ns.response(200, "Success", [distance_fields])
     def get(self, *args):
         """Return list of hotels matching search criteria."""
         args = self.reqparse.parse_args()
-        hotel_filters = []
-        room_types = ("double", "queen", "king")
-        checkin = args["checkin"]
-
-        # Can't use checkout date in inventory table query so convert to
-        #  last night of stay
-        lastnight = args["checkout"] - timedelta(days=1)
-
-        # Get the length of stay in days
-        delta = args["checkout"] - checkin
-        day_count = delta.days
-
-        if len(args) > 2:
-            if args["name"]:
-                hotel_filters.append(Hotels.name.in_(args["name"]))
-            if args["surface_type"]:
-                hotel_filters.append(
-                    Hotels.astrd_surface_composition.in_(args["surface_type"])
-                )
-            if args["room_type"]:
-                room_types = tuple(args["room_type"])
-
-        # Search inventory table for hotels with available rooms for stay
-        stmt = (
-            "with hotel_dates as ( "
-            "select distinct hotel_id, date "
-            "from room_inventory "
-            f"where date between :checkin and :lastnight "
-            "and (max_rooms_available - rooms_reserved) > 0 "
-            f"and room_type in :room_types "
-            "), "
-            "hotel_day_count as ( "
-            "select distinct hotel_id, count(date) over(PARTITION BY hotel_id) as day_count "
-            "from hotel_dates "
-            "), "
-            "available_hotels as ( "
-            "select hotel_id "
-            "from hotel_day_count "
-            f"where day_count = :day_count "
-            ") "
-            "select distinct hotel_id "
-            "from available_hotels left join hotels on available_hotels.hotel_id = hotels.id; "
+        hotels = search_available(
+            checkin=args["checkin"],
+            checkout=args["checkout"],
+            room_types=args["room_type"],
+            names=args["name"],
+            surface_types=args["surface_type"],
+        )
+        sort_by_distance = args["sort"] == "distance"
+        if (
+            args["include_distance"]
+            or sort_by_distance
+            or args["max_distance_au"] is not None
+        ):
+            hotels = with_distances(
+                hotels,
+                args["checkin"],
+                sort_by_distance=sort_by_distance,
+                max_distance_au=args["max_distance_au"],
+            )
+
+        return marshal(
+            hotels, distance_fields if args["include_distance"] else hotel_fields
+        )
+
+
+class FlexibleAvailabilities(Resource):
+    @availabilities_ns.expect(flexible_parser)
+    @availabilities_ns.marshal_with(flexible_fields)
+    def get(self):
+        """Return hotels with every check-in date of a stay that fits the window."""
+        args = flexible_parser.parse_args()
+        window_days = (args["window_end"] - args["window_start"]).days
+        max_days = current_app.config["FLEXIBLE_MAX_WINDOW_DAYS"]
+        if not 0 < args["nights"] <= window_days <= max_days:
+            abort(
+                400,
+                f"Stay must be at least 1 night and fit in a window of at most "
+                f"{max_days} days.",
+            )
+        hotels = search_flexible(
+            window_start=args["window_start"],
+            window_end=args["window_end"],
+            nights=args["nights"],
+            room_types=args["room_type"],
+            names=args["name"],
+            surface_types=args["surface_type"],
         )
-        stmt = text(stmt)
-        avail_hotels = db.engine.execute(
-            stmt,
-            checkin=checkin.isoformat(),
-            lastnight=lastnight.isoformat(),
-            room_types=room_types,
-            day_count=day_count,
-        ).fetchall()
-        avail_hotels = [v[0] for v in avail_hotels]
-
-        # Get hotels with availabilities
-        hotel_filters.append(Hotels.id.in_(avail_hotels))
-        hotels = db.session.query(Hotels).filter(*hotel_filters).all()
 
         return hotels
 
 
 availabilities_ns.add_resource(Availabilities, "", endpoint="availabilities")
+availabilities_ns.add_resource(
+    FlexibleAvailabilities, "/flexible", endpoint="flexible_availabilities"
+)
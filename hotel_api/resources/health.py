@@ -0,0 +1,48 @@
+from flask_restx import Namespace, Resource
+from sqlalchemy.exc import SQLAlchemyError
+
+from hotel_api.extensions import (
+    db,
+    availability_cache,
+    availability_index,
+    ephemeris,
+)
+from hotel_api.jobs import job_stats
+from lib.util_sqlalchemy import pool_stats
+
+health_ns = Namespace("health")
+
+
+class Health(Resource):
+    @health_ns.response(200, "Database reachable")
+    @health_ns.response(503, "Database unreachable")
+    def get(self):
+        """Report database connectivity and pool, cache and job counters."""
+        try:
+            db.session.execute("select 1")
+            database = "ok"
+        except SQLAlchemyError:
+            database = "unavailable"
+        finally:
+            db.session.rollback()
+
+        health = {
+            "status": "ok" if database == "ok" else "degraded",
+            "database": database,
+            "engines": dict(
+                primary=pool_stats(db.engine),
+                replicas=[
+                    pool_stats(engine) for engine in db.router.engines().values()
+                ],
+            ),
+            "caches": {
+                "availability": availability_cache.stats(),
+                "availability_index": availability_index.stats(),
+                "ephemeris": ephemeris.stats(),
+            },
+            "jobs": job_stats(),
+        }
+        return health, 200 if database == "ok" else 503
+
+
+health_ns.add_resource(Health, "", endpoint="health")
@@ -1,9 +1,18 @@
-from datetime import datetime, date
+import codecs
+from datetime import datetime, date, timedelta
 
+from flask import abort, current_app, request
 from flask_restx import Namespace, Resource, reqparse, fields, marshal
+from werkzeug.datastructures import FileStorage
 
-from hotel_api.models import db, Hotels
+from hotel_api.availability import ROOM_TYPES
+from hotel_api.hotel_import import FORMATS, import_hotels
+from hotel_api.models import db, Hotels, InventoryVersions, RoomInventory
+from lib.util_auth import admin_token_required
 from lib.util_datetime import months_out
+from lib.util_http_cache import conditional
+from lib.util_pagination import pagination_parser, page_limit, next_page, page_version
+from lib.util_streaming import NDJSON_MIMETYPE, ndjson_export
 
 hotels_ns = Namespace("hotels")
 
@@ -24,6 +33,57 @@ hotel_fields = hotels_ns.model(
     },
 )
 
+import_fields = hotels_ns.model(
+    "hotel_imports",
+    {
+        "read": fields.Integer(example=50000),
+        "imported": fields.Integer(example=49990),
+        "skipped": fields.Integer(example=8),
+        "invalid": fields.Integer(example=2),
+        "errors": fields.List(
+            fields.Raw(example={"line": 12, "error": "Missing name."})
+        ),
+    },
+)
+
+# Parser for paging through HotelList
+page_parser = pagination_parser()
+
+# Parse calendar range from url query string
+calendar_parser = reqparse.RequestParser()
+calendar_parser.add_argument(
+    "from", type=lambda s: date.fromisoformat(s), required=False, location="args"
+)
+calendar_parser.add_argument(
+    "to", type=lambda s: date.fromisoformat(s), required=False, location="args"
+)
+calendar_parser.add_argument(
+    "room_type",
+    type=str,
+    required=False,
+    location="args",
+    choices=["king", "queen", "double"],
+    action="append",
+)
+
+# Parse uploaded hotel import file
+import_parser = reqparse.RequestParser()
+import_parser.add_argument(
+    "file",
+    type=FileStorage,
+    required=True,
+    help="No import file provided.",
+    location="files",
+)
+import_parser.add_argument(
+    "format",
+    type=str,
+    required=False,
+    choices=FORMATS,
+    help="Import format, guessed from the file name by default.",
+    location="form",
+)
+
 # Parser for HotelList resources
 reqparse = reqparse.RequestParser()
 reqparse.add_argument(
@@ -92,11 +152,20 @@ class HotelList(Resource):
         self.reqparse = reqparse
         super(HotelList, self).__init__(*args, **kwargs)
 
+    @ndjson_export(
+        hotel_fields, lambda: Hotels.with_room_counts().order_by(Hotels.id)
+    )
+    @hotels_ns.produces(["application/json", NDJSON_MIMETYPE])
+    @hotels_ns.expect(page_parser)
+    @conditional(lambda: page_version(Hotels))
     @hotels_ns.marshal_with(hotel_fields)
     def get(self):
-        """List all hotels."""
-        hotels = Hotels.get_hotels()
-        return hotels["fields"]
+        """List hotels, one page at a time."""
+        args = page_parser.parse_args()
+        limit = page_limit(args["limit"])
+        hotels = Hotels.get_hotels(after=args["after"], limit=limit)
+        hotels, headers = next_page(hotels["fields"], limit, lambda h: h["id"])
+        return hotels, 200, headers
 
     @hotels_ns.expect(reqparse)
     @hotels_ns.marshal_with(hotel_fields, code=201)
@@ -129,6 +198,7 @@ class Hotel(Resource):
         self.reqparse = reqparse
         super(Hotel, self).__init__(*args, **kwargs)
 
+    @conditional(Hotels.version)
     @hotels_ns.marshal_with(hotel_fields)
     def get(self, id):
         """List specified hotel."""
@@ -151,5 +221,85 @@ class Hotel(Resource):
         return {"deleted": True}
 
 
+def calendar_version(id):
+    """
+    Return the hotel's inventory version along with the calendar's range.
+
+    There is no Last-Modified: the default range moves with today's date
+    while the inventory version does not.
+    """
+    version = InventoryVersions.hotel_version(id)
+    if version is None:
+        return None
+    return (
+        None,
+        version[1],
+        id,
+        date.today(),
+        tuple(sorted(request.args.items(multi=True))),
+    )
+
+
+def calendar_cache_control():
+    return f"public, max-age={current_app.config['CALENDAR_MAX_AGE_SECONDS']}"
+
+
+class HotelCalendar(Resource):
+    @hotels_ns.expect(calendar_parser)
+    @conditional(calendar_version, cache_control=calendar_cache_control)
+    def get(self, id):
+        """
+        List free rooms per night of specified hotel, from today for 30 nights
+        by default. Nights are columns: free[room_type][i] is the number of
+        free rooms on dates[i].
+        """
+        args = calendar_parser.parse_args()
+        start = args["from"] or date.today()
+        end = args["to"] or start + timedelta(
+            days=current_app.config["CALENDAR_DEFAULT_DAYS"]
+        )
+        max_days = current_app.config["CALENDAR_MAX_DAYS"]
+        if not 0 < (end - start).days <= max_days:
+            abort(400, f"Calendar must span between 1 and {max_days} nights.")
+        room_types = [t for t in ROOM_TYPES if t in (args["room_type"] or ROOM_TYPES)]
+
+        free = RoomInventory.calendar(id, start, end, room_types)
+        dates = [
+            (start + timedelta(days=i)).isoformat() for i in range((end - start).days)
+        ]
+        return {
+            "hotel_id": id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "dates": dates,
+            "free": free,
+        }
+
+
+class HotelImport(Resource):
+    @hotels_ns.doc(security="Bearer")
+    @hotels_ns.expect(import_parser)
+    @hotels_ns.response(401, "Token is invalid or expired.")
+    @hotels_ns.response(403, "Admin token required.")
+    @hotels_ns.marshal_with(import_fields)
+    @admin_token_required
+    def post(self):
+        """
+        Import hotels with their room counts from a CSV or JSONL file.
+
+        Hotels whose name already exists are skipped. Use the hotels import
+        command for very large files.
+        """
+        args = import_parser.parse_args()
+        upload = args["file"]
+        format = args["format"] or (upload.filename or "").rsplit(".", 1)[-1].lower()
+        if format not in FORMATS:
+            abort(400, f"Import format must be one of {', '.join(FORMATS)}.")
+
+        return import_hotels(codecs.iterdecode(upload.stream, "utf-8"), format)
+
+
 hotels_ns.add_resource(HotelList, "", endpoint="hotels")
-hotels_ns.add_resource(Hotel, "/<int:id>", endpoint="hotel")
\ No newline at end of file
+hotels_ns.add_resource(Hotel, "/<int:id>", endpoint="hotel")
+hotels_ns.add_resource(HotelImport, "/import", endpoint="hotel_import")
+hotels_ns.add_resource(HotelCalendar, "/<int:id>/calendar", endpoint="hotel_calendar")
\ No newline at end of file
@@ -1,7 +1,14 @@
 from datetime import datetime, date
-from flask import abort, request
+from types import SimpleNamespace
+from flask import abort, current_app, request
 from flask_restx import Namespace, Resource, reqparse, fields, marshal
-from hotel_api.models import db, Reservations
+from werkzeug.exceptions import BadRequest
+from hotel_api.availability import ROOM_TYPES
+from hotel_api.models import db, Reservations, Users
+from lib.util_http_cache import conditional
+from lib.util_pagination import pagination_parser, page_limit, next_page, page_version
+from lib.util_sqlalchemy import keyset_page
+from lib.util_streaming import NDJSON_MIMETYPE, ndjson_export
 
 reservations_ns = Namespace("reservations")
 
@@ -23,40 +30,62 @@ reservation_fields = reservations_ns.model(
     },
 )
 
+batch_result_fields = reservations_ns.model(
+    "reservation_batch_results",
+    {
+        "index": fields.Integer(example=0),
+        "status": fields.String(example="created"),
+        "error": fields.String(example=None),
+        "reservation": fields.Nested(reservation_fields, allow_null=True),
+    },
+)
+
+batch_fields = reservations_ns.model(
+    "reservation_batches",
+    {
+        "mode": fields.String(example="all_or_nothing"),
+        "created": fields.Integer(example=2),
+        "results": fields.List(fields.Nested(batch_result_fields)),
+    },
+)
+
+# Parser for paging through ReservationList
+page_parser = pagination_parser()
+
 # Argument parser for both ReservationList and Reservations
-reqparse = reqparse.RequestParser()  # these lines are for input validation
-reqparse.add_argument(
+reservation_parser = reqparse.RequestParser()  # these lines are for input validation
+reservation_parser.add_argument(
     "checkin_date",
     type=lambda s: date.fromisoformat(s),
     required=True,
     help="No checkin date provided.",
     location="json",
 )
-reqparse.add_argument(
+reservation_parser.add_argument(
     "checkout_date",
     type=lambda s: date.fromisoformat(s),
     required=True,
     help="No checkout date provided.",
     location="json",
 )
-reqparse.add_argument(
+reservation_parser.add_argument(
     "hotel_id", type=int, required=True, help="No hotel id provided.", location="json"
 )
-reqparse.add_argument(
+reservation_parser.add_argument(
     "guest_full_name",
     type=str,
     required=True,
     help="No guest name provided.",
     location="json",
 )
-reqparse.add_argument(
+reservation_parser.add_argument(
     "customer_user_id",
     type=int,
     required=True,
     help="No customer user id provided.",
     location="json",
 )
-reqparse.add_argument(
+reservation_parser.add_argument(
     "desired_room_type",
     type=str,
     required=True,
@@ -67,16 +96,30 @@ reqparse.add_argument(
 
 class ReservationList(Resource):
     def __init__(self, *args, **kwargs):
-        self.reqparse = reqparse
+        self.reqparse = reservation_parser
         super(ReservationList, self).__init__(*args, **kwargs)
 
+    @ndjson_export(
+        reservation_fields,
+        lambda: db.session.query(*Reservations.__table__.columns).order_by(
+            Reservations.id
+        ),
+    )
+    @reservations_ns.produces(["application/json", NDJSON_MIMETYPE])
+    @reservations_ns.expect(page_parser)
+    @conditional(lambda: page_version(Reservations))
     @reservations_ns.marshal_with(reservation_fields)
     def get(self):
-        """List all reservations."""
-        reservations = Reservations.query.all()
-        return reservations
+        """List reservations, one page at a time."""
+        args = page_parser.parse_args()
+        limit = page_limit(args["limit"])
+        reservations = keyset_page(
+            Reservations.query, Reservations.id, args["after"], limit
+        ).all()
+        reservations, headers = next_page(reservations, limit, lambda r: r.id)
+        return reservations, 200, headers
 
-    @reservations_ns.expect(reqparse)
+    @reservations_ns.expect(reservation_parser)
     @reservations_ns.response(201, "Created")
     @reservations_ns.marshal_with(reservation_fields)
     def post(self):
@@ -101,16 +144,17 @@ class ReservationList(Resource):
 
 class Reservation(Resource):
     def __init__(self, *args, **kwargs):
-        self.reqparse = reqparse
+        self.reqparse = reservation_parser
         super(Reservation, self).__init__(*args, **kwargs)
 
+    @conditional(Reservations.version)
     @reservations_ns.marshal_with(reservation_fields)
     def get(self, id):
         """List specified reservation."""
         reservation = Reservations.query.get_or_404(id)
         return reservation
 
-    @reservations_ns.expect(reqparse)
+    @reservations_ns.expect(reservation_parser)
     @reservations_ns.marshal_with(reservation_fields)
     def put(self, id):
         """Update specified reservation."""
@@ -128,5 +172,103 @@ class Reservation(Resource):
         return {"cancelled": True}
 
 
+batch_parser = reqparse.RequestParser()
+batch_parser.add_argument(
+    "reservations",
+    type=list,
+    required=True,
+    help="No reservations provided.",
+    location="json",
+)
+batch_parser.add_argument(
+    "mode",
+    type=str,
+    default="all_or_nothing",
+    choices=["all_or_nothing", "best_effort"],
+    location="json",
+)
+
+
+def parse_stay(item):
+    """
+    Validate one batch item with the single reservation parser.
+
+    :return: (stay dict, None) or (None, error message)
+    """
+    if not isinstance(item, dict):
+        return None, "Reservation must be an object."
+    try:
+        args = reservation_parser.parse_args(req=SimpleNamespace(json=item))
+    except BadRequest as e:
+        errors = getattr(e, "data", {}).get("errors") or {"": e.description}
+        return None, " ".join(str(error) for error in errors.values())
+    if args["checkout_date"] <= args["checkin_date"]:
+        return None, "Checkout date must be after checkin date."
+    if args["desired_room_type"] not in ROOM_TYPES:
+        return None, f"Room type must be one of {', '.join(ROOM_TYPES)}."
+    return {name: args[name] for name in args}, None
+
+
+class ReservationBatch(Resource):
+    @reservations_ns.expect(batch_parser)
+    @reservations_ns.response(201, "Every reservation created")
+    @reservations_ns.response(200, "Some reservations created in best_effort mode")
+    @reservations_ns.response(409, "No reservations created")
+    @reservations_ns.marshal_with(batch_fields)
+    def post(self):
+        """
+        Add many reservations in one transaction.
+
+        In all_or_nothing mode (the default) no reservation is made unless
+        every one of them is valid and available. In best_effort mode the
+        valid and available reservations are made, in order.
+        """
+        args = batch_parser.parse_args()
+        items = args["reservations"]
+        max_items = current_app.config["RESERVATION_BATCH_MAX_ITEMS"]
+        if not 0 < len(items) <= max_items:
+            abort(400, f"A batch must hold between 1 and {max_items} reservations.")
+        all_or_nothing = args["mode"] == "all_or_nothing"
+
+        parsed = [parse_stay(item) for item in items]
+        customer_ids = {stay["customer_user_id"] for stay, _ in parsed if stay}
+        customers = {
+            id
+            for id, in db.session.query(Users.id).filter(Users.id.in_(customer_ids))
+        }
+        results = []
+        for index, (stay, error) in enumerate(parsed):
+            if stay and stay["customer_user_id"] not in customers:
+                stay, error = None, "Customer does not exist."
+            status = "invalid" if error else "not_attempted"
+            results.append(dict(index=index, status=status, error=error, stay=stay))
+
+        stays = [result for result in results if result["stay"]]
+        if all_or_nothing and len(stays) < len(results):
+            stays = []  # An invalid reservation rejects the whole batch
+        if stays:
+            fits, added = Reservations.add_batch(
+                [result["stay"] for result in stays], all_or_nothing=all_or_nothing
+            )
+            for result, fit, reservation in zip(stays, fits, added):
+                if reservation is not None:
+                    result.update(status="created", reservation=reservation)
+                elif not fit:
+                    result.update(
+                        status="unavailable",
+                        error="Hotel is not available for dates and room type.",
+                    )
+        created = sum(result["status"] == "created" for result in results)
+
+        if created == len(results):
+            code = 201
+        elif created:
+            code = 200
+        else:
+            code = 409
+        return dict(mode=args["mode"], created=created, results=results), code
+
+
 reservations_ns.add_resource(ReservationList, "", endpoint="reservations")
 reservations_ns.add_resource(Reservation, "/<int:id>", endpoint="reservation")
+reservations_ns.add_resource(ReservationBatch, "/batch", endpoint="reservation_batch")
@@ -4,6 +4,8 @@ from flask import request, abort
 from flask_restx import Namespace, Resource, fields, marshal
 
 from hotel_api.models import db, Users
+from lib.util_pagination import pagination_parser, page_limit, next_page
+from lib.util_sqlalchemy import keyset_page
 
 users_ns = Namespace("users")
 
@@ -21,20 +23,27 @@ user = users_ns.model(
     strict=True,
 )
 
+# Parser for paging through UserList
+page_parser = pagination_parser()
+
 user_post = users_ns.inherit(
     "user_post", user, {"password": fields.String(required=True)}
 )
 
 
 class UserList(Resource):
+    @users_ns.expect(page_parser)
     @users_ns.marshal_with(user)
     def get(self):
         """
-        Get all users.
+        Get users, one page at a time.
         """
-        users = Users.query.all()
+        args = page_parser.parse_args()
+        limit = page_limit(args["limit"])
+        users = keyset_page(Users.query, Users.id, args["after"], limit).all()
+        users, headers = next_page(users, limit, lambda u: u.id)
 
-        return users
+        return users, 200, headers
 
     @users_ns.expect(user_post, validate=True)
     @users_ns.response(400, "User with this email or user_name already exists.")
@@ -0,0 +1,172 @@
+"""Route the reads of read-only requests to Postgres replicas.
+
+GET and HEAD requests are served from one of SQLALCHEMY_REPLICA_URIS, picked
+once per request. Every other request, flushes, core INSERT/UPDATE/DELETE,
+SELECT ... FOR UPDATE and raw text() statements always go to the primary;
+text() statements known to only read are marked with read_only(). After a
+successful write the client is pinned to the primary for REPLICA_PIN_SECONDS,
+so it reads its own writes while the replicas catch up. The pin is a short
+lived cookie and, for API clients that do not keep cookies, is also kept by
+access token in the worker process that handled the write.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import create_engine, orm
+from sqlalchemy.sql.expression import TextClause, UpdateBase
+
+from hotel_api.token_cache import token_digest
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_COOKIE = "db_pin"
+MAX_TOKEN_PINS = 10000  # Pinned access tokens remembered per process
+
+
+def read_only(statement):
+    """Mark a text() statement as a plain read that a replica may serve."""
+    return statement.execution_options(read_only=True)
+
+
+def writes(clause):
+    """
+    Return True if a statement may write or lock rows.
+
+    Raw SQL can write anywhere, e.g. from a CTE, so text() statements count
+    as writes unless marked with read_only().
+    """
+    if isinstance(clause, UpdateBase) or getattr(clause, "is_dml", False):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause._execution_options.get("read_only", False)
+    return getattr(clause, "_for_update_arg", None) is not None
+
+
+class RoutingSession(SignallingSession):
+    """Session sending reads to the replica chosen for the current request."""
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get("db_replica") if has_app_context() else None
+        if replica and not self._flushing and not writes(clause):
+            return get_state(self.app).db.router.engine(replica)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy whose sessions can read from replicas."""
+
+    def __init__(self, *args, **kwargs):
+        self.router = ReplicaRouter()
+        super(RoutingSQLAlchemy, self).__init__(*args, **kwargs)
+
+    def init_app(self, app):
+        super(RoutingSQLAlchemy, self).init_app(app)
+        self.router.init_app(app)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRouter(object):
+    """Choose a replica per request and pin writers to the primary."""
+
+    def __init__(self, app=None):
+        self._engines = {}
+        self._token_pins = OrderedDict()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.route_request)
+        app.after_request(self.pin_writer)
+
+    def engine(self, uri):
+        """Return the engine for a replica, created on first use."""
+        if uri not in self._engines:
+            options = current_app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+            self._engines[uri] = create_engine(uri, **options)
+        return self._engines[uri]
+
+    def engines(self):
+        """Return the replica engines created so far by URI."""
+        return dict(self._engines)
+
+    def dispose(self):
+        for engine in self._engines.values():
+            engine.dispose()
+
+        return None
+
+    def route_request(self):
+        """Pick a replica for a read-only request that is not pinned."""
+        replicas = current_app.config.get("SQLALCHEMY_REPLICA_URIS") or []
+        if replicas and request.method in READ_METHODS and not self.pinned():
+            g.db_replica = random.choice(replicas)
+        else:
+            g.db_replica = None
+
+        return None
+
+    @staticmethod
+    def _token_key():
+        """Return the digest of the request's access token, or None."""
+        token = request.headers.get("Authorization")
+        return token_digest(token.encode("utf-8")) if token else None
+
+    def pinned(self):
+        """Return True while the client's read-your-writes pin is valid."""
+        pin_seconds = current_app.config.get("REPLICA_PIN_SECONDS", 0)
+        now = time.time()
+        key = self._token_key()
+        if key is not None:
+            with self._lock:
+                pinned_until = self._token_pins.get(key, 0)
+                if pinned_until and pinned_until <= now:
+                    del self._token_pins[key]
+            if now < pinned_until:
+                return True
+        try:
+            pinned_until = int(request.cookies.get(PIN_COOKIE, 0))
+        except ValueError:
+            return False
+        return now < pinned_until <= now + pin_seconds
+
+    def pin_writer(self, response):
+        """Pin a client that has just written to the primary."""
+        pin_seconds = current_app.config.get("REPLICA_PIN_SECONDS", 0)
+        if (
+            current_app.config.get("SQLALCHEMY_REPLICA_URIS")
+            and pin_seconds
+            and request.method not in READ_METHODS
+            and response.status_code < 400
+        ):
+            pinned_until = int(time.time()) + pin_seconds
+            response.set_cookie(
+                PIN_COOKIE, str(pinned_until), max_age=pin_seconds, httponly=True
+            )
+            key = self._token_key()
+            if key is not None:
+                with self._lock:
+                    self._token_pins[key] = pinned_until
+                    self._token_pins.move_to_end(key)
+                    while len(self._token_pins) > MAX_TOKEN_PINS:
+                        self._token_pins.popitem(last=False)
+
+        return response
+
+
+@contextmanager
+def use_primary():
+    """Send the reads inside the block to the primary."""
+    replica = g.get("db_replica")
+    g.db_replica = None
+    try:
+        yield
+    finally:
+        g.db_replica = replica
@@ -0,0 +1,156 @@
+"""In-process caches that keep access token checks off the database."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+def token_digest(token):
+    """Return the hex SHA-256 digest of an access token."""
+    if isinstance(token, str):
+        token = token.encode("ascii")
+    return hashlib.sha256(token).hexdigest()
+
+
+class TokenCache(object):
+    """
+    Bounded LRU cache of verified access token payloads keyed by token digest.
+
+    An entry is only returned until the token's exp claim, after which the
+    token has to go through jwt.decode again and fails as expired.
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 0
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get("TOKEN_CACHE_SIZE", 0)
+
+    def get(self, digest):
+        """Return the cached payload for a token digest, or None."""
+        with self._lock:
+            payload = self._payloads.get(digest)
+            if payload is None:
+                return None
+            if payload["exp"] <= time.time():
+                del self._payloads[digest]
+                return None
+            self._payloads.move_to_end(digest)
+            return payload
+
+    def set(self, digest, payload):
+        """Cache a verified payload, evicting the least recently used entries."""
+        if not self.max_size:
+            return None
+        with self._lock:
+            self._payloads[digest] = payload
+            self._payloads.move_to_end(digest)
+            while len(self._payloads) > self.max_size:
+                self._payloads.popitem(last=False)
+
+        return None
+
+    def discard(self, digest):
+        with self._lock:
+            self._payloads.pop(digest, None)
+
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+
+        return None
+
+
+class TokenBlacklist(object):
+    """
+    In-memory mirror of the blacklisted_tokens table keyed by token digest.
+
+    Logouts handled by this process are added immediately. Logouts handled by
+    other workers are pulled in incrementally (rows with a higher id than the
+    last seen) at most every TOKEN_BLACKLIST_REFRESH_SECONDS. Ids are assigned
+    before commit, so a logout committed after a higher id was read would be
+    skipped by the incremental query; every TOKEN_BLACKLIST_REBUILD_SECONDS
+    all unexpired rows are read again instead, which bounds how long a token
+    logged out elsewhere can still be used here. Between refreshes a lookup
+    never touches the database.
+    """
+
+    def __init__(self, app=None):
+        self.refresh_seconds = 0
+        self.rebuild_seconds = 0
+        self._expires_at = {}
+        self._last_id = 0
+        self._refreshed_at = None
+        self._rebuilt_at = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.refresh_seconds = app.config.get("TOKEN_BLACKLIST_REFRESH_SECONDS", 0)
+        self.rebuild_seconds = app.config.get("TOKEN_BLACKLIST_REBUILD_SECONDS", 0)
+
+    def contains(self, digest):
+        """Return True if the token digest has been blacklisted."""
+        if (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at >= self.refresh_seconds
+        ):
+            self.refresh()
+        return digest in self._expires_at
+
+    def add(self, digest, expires_at):
+        """Blacklist a token digest until expires_at (a datetime)."""
+        with self._lock:
+            self._expires_at[digest] = expires_at
+
+        return None
+
+    def refresh(self):
+        """
+        Pull rows added to the table since the last refresh, or every
+        unexpired row when a rebuild is due, and drop expired ones.
+        """
+        from hotel_api.models import BlacklistedTokens
+        from hotel_api.routing import use_primary
+
+        started_at = time.monotonic()
+        rebuild = (
+            self._rebuilt_at is None
+            or started_at - self._rebuilt_at >= self.rebuild_seconds
+        )
+        # A lagging replica would let logged out tokens through for longer
+        with use_primary():
+            rows = BlacklistedTokens.blacklisted_since(0 if rebuild else self._last_id)
+        now = datetime.now()
+        with self._lock:
+            # Rows are only deleted once expired, so a rebuild merges rather
+            #  than replaces and cannot drop a token added in the meantime.
+            for id, digest, expires_at in rows:
+                self._expires_at[digest] = expires_at
+                self._last_id = max(self._last_id, id)
+            for digest in [d for d, e in self._expires_at.items() if e <= now]:
+                del self._expires_at[digest]
+            self._refreshed_at = started_at
+            if rebuild:
+                self._rebuilt_at = started_at
+
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._expires_at.clear()
+            self._last_id = 0
+            self._refreshed_at = None
+            self._rebuilt_at = None
+
+        return None
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, request
+from flask_restx.utils import unpack
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+
+
+def conditional(version_getter, cache_control=None):
+    """
+    Answer conditional GETs from a cheap version lookup.
+
+    version_getter is called with the view's URL arguments before the view
+    runs.
+    It returns None when the version is unknown (e.g. the row does not exist)
+    and the view runs as usual. Otherwise it returns a tuple whose first item
+    is the last_modified_date of the representation (or None) and whose other
+    items identify it. A matching If-None-Match or If-Modified-Since is
+    answered with 304 without running the view, and full responses carry a
+    weak ETag and Last-Modified header.
+
+    cache_control is an optional callable returning a Cache-Control header
+    value, sent with both 304 and full responses.
+
+    Place it outside marshal_with so the 304 skips loading and marshalling.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            version = version_getter(**kwargs)
+            if version is None:
+                return f(*args, **kwargs)
+
+            last_modified = version[0]
+            etag = hashlib.sha1(repr(tuple(version)).encode()).hexdigest()
+            headers = {"ETag": quote_etag(etag, weak=True)}
+            if last_modified is not None:
+                headers["Last-Modified"] = http_date(last_modified)
+            if cache_control is not None:
+                headers["Cache-Control"] = cache_control()
+
+            if not is_resource_modified(
+                request.environ, etag=etag, last_modified=last_modified
+            ):
+                return current_app.response_class(status=304, headers=headers)
+
+            data, code, view_headers = unpack(f(*args, **kwargs))
+            return data, code, {**headers, **(view_headers or {})}
+
+        return decorated
+
+    return decorator
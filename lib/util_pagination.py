@@ -0,0 +1,60 @@
+from flask import current_app, request, url_for
+from flask_restx import reqparse, inputs
+
+
+def pagination_parser():
+    """ Return parser for keyset pagination query string arguments. """
+    parser = reqparse.RequestParser()
+    parser.add_argument(
+        "after",
+        type=int,
+        required=False,
+        location="args",
+        help="Return items with an id greater than this cursor.",
+    )
+    parser.add_argument(
+        "limit",
+        type=inputs.positive,
+        required=False,
+        location="args",
+        help="Maximum number of items to return.",
+    )
+    return parser
+
+
+def page_limit(limit):
+    """ Return requested page size, defaulted and capped by the app config. """
+    if limit is None:
+        limit = current_app.config.get("DEFAULT_PAGE_SIZE")
+    return min(limit, current_app.config.get("MAX_PAGE_SIZE"))
+
+
+def next_page(items, limit, get_id):
+    """
+    Trim the look-ahead row from a keyset page and return headers for the
+    next page.
+
+    :param items: Rows fetched with lib.util_sqlalchemy.keyset_page
+    :param limit: Page size the rows were fetched with
+    :param get_id: Function returning the cursor id of a row
+    :return: Tuple of page items and response headers
+    """
+    headers = {}
+    if len(items) > limit:
+        items = items[:limit]
+        cursor = get_id(items[-1])
+        args = dict(request.args.to_dict(), after=cursor, limit=limit)
+        next_url = url_for(request.endpoint, _external=True, **args)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+        headers["X-Next-Cursor"] = str(cursor)
+
+    return items, headers
+
+
+def page_version(model):
+    """
+    Return the version of the keyset page requested in the query string, for
+    lib.util_http_cache.conditional.
+    """
+    args = pagination_parser().parse_args()
+    return model.page_version(args["after"], page_limit(args["limit"]))
@@ -1 +1,30 @@
-row2dict = lambda row: {c.name: getattr(row, c.name) for c in row.__table__.columns}
\ No newline at end of file
+row2dict = lambda row: {c.name: getattr(row, c.name) for c in row.__table__.columns}
+
+
+def keyset_page(query, id_column, after, limit):
+    """
+    Restrict a query to the page of rows following a cursor.
+
+    Rows are ordered by id_column and filtered with id_column > after, so deep
+    pages cost the same index range scan as the first. One extra row is
+    fetched to tell whether another page follows.
+    """
+    if after is not None:
+        query = query.filter(id_column > after)
+    return query.order_by(id_column).limit(limit + 1)
+
+
+def pool_stats(engine):
+    """
+    Return a dict describing the connection pool of an engine.
+
+    QueuePool reports its size and how many connections are checked in,
+    checked out and in overflow. Pools without those counters (NullPool when
+    running behind pgbouncer) only report their class.
+    """
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for counter in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, counter):
+            stats[counter] = getattr(pool, counter)()
+    return stats
@@ -0,0 +1,52 @@
+import json
+from functools import wraps
+
+from flask import Response, request, stream_with_context
+from flask_restx import marshal
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_ndjson():
+    """ Return True if the client prefers newline delimited JSON. """
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_ndjson(query, fields, batch_size=1000):
+    """
+    Stream every row of a column query as newline delimited JSON.
+
+    Rows are read through a server side cursor batch_size at a time and
+    written out as soon as they are marshalled, so memory stays flat no
+    matter how many rows the query returns.
+
+    :param query: SQLAlchemy query selecting columns, not entities
+    :param fields: flask-restx model used to marshal each row
+    :param batch_size: Rows fetched from the cursor per round trip
+    :return: Streaming response
+    """
+
+    def generate():
+        for row in query.yield_per(batch_size):
+            yield json.dumps(marshal(row._asdict(), fields)) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def ndjson_export(fields, query_factory):
+    """
+    Serve a list endpoint as an NDJSON stream of every row when the client
+    sends Accept: application/x-ndjson. Other requests fall through to the
+    decorated method.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if wants_ndjson():
+                return stream_ndjson(query_factory(), fields)
+            return f(*args, **kwargs)
+
+        return decorated
+
+    return decorator
@@ -1,11 +1,11 @@
 import pytest
 
 from config import settings
-from tests.util import USER_NAME, EMAIL, PASSWORD
+from tests.util import USER_NAME, EMAIL, PASSWORD, hotel_columns
 from lib.seed_data.seed_data import seed_db
 from hotel_api.extensions import db as _db
 from hotel_api.app import create_app
-from hotel_api.models import Users
+from hotel_api.models import Hotels, Users
 
 
 @pytest.yield_fixture(scope="session")
@@ -69,4 +69,28 @@ def user(db):
     user = Users(user_name=USER_NAME, email=EMAIL, password=PASSWORD)
     user.add()
 
-    return user
\ No newline at end of file
+    return user
+
+
+@pytest.fixture(scope="session")
+def hotel_factory(db):
+    """
+    Setup a function adding hotels with rooms and inventory.
+
+    :param db: Pytest db fixture
+    :return: Function taking a unique hotel name, room counts per type,
+        months of inventory and any hotel column to override, and returning
+        the added hotel
+    """
+
+    def add_hotel(name, double=0, queen=0, king=1, inv_months=1, **columns):
+        hotel = Hotels(**hotel_columns(name, **columns))
+        hotel.add_hotel(
+            total_double_rooms=double,
+            total_queen_rooms=queen,
+            total_king_rooms=king,
+            inv_months=inv_months,
+        )
+        return hotel
+
+    return add_hotel
@@ -4,6 +4,7 @@ from flask import url_for
 
 from tests.util import register_user, login_user, get_user, logout_user
 from hotel_api.models import BlacklistedTokens
+from hotel_api.token_cache import token_digest
 
 
 class TestAuthRegister(object):
@@ -141,7 +142,7 @@ class TestAuthLogout(object):
         assert response.status_code == 200
         blacklist = BlacklistedTokens.query.all()
         assert len(blacklist) == 1
-        assert access_token == blacklist[0].token
+        assert token_digest(access_token) == blacklist[0].token_hash
 
     def test_authlogout_valid_user_expired_token(self, client, db):
         """ AuthLogout endpoint should return 200 and message for user with valid token.  """
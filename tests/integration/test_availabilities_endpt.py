@@ -115,3 +115,69 @@ class TestAvailabilities(object):
         )
 
         assert response.status_code == 400
+
+
+class TestFlexibleAvailabilities(object):
+    def test_flexible_availabilities_for_valid_input(self, client, db):
+        """
+        Flexible availabilities endpoint should return hotels with their
+        check-in dates.
+        """
+        response = client.get(
+            url_for("api.flexible_availabilities")
+            + f"?window_start={checkin_date}"
+            + f"&window_end={checkout_date}"
+            + "&nights=2"
+        )
+        json_response = response.get_json()
+
+        assert response.status_code == 200
+        assert "name" in json_response[0]
+        assert checkin_date in json_response[0]["checkin_dates"]
+
+    def test_flexible_availabilities_for_stay_longer_than_window(self, client, db):
+        """
+        Flexible availabilities endpoint should return 400 when the stay
+        does not fit in the window.
+        """
+        response = client.get(
+            url_for("api.flexible_availabilities")
+            + f"?window_start={checkin_date}"
+            + f"&window_end={checkout_date}"
+            + "&nights=6"
+        )
+
+        assert response.status_code == 400
+
+
+class TestAvailabilitiesByDistance(object):
+    def test_availabilities_sorted_by_distance(self, client, db):
+        """
+        Availabilities endpoint should return hotels nearest first with
+        their distance when asked to.
+        """
+        response = client.get(
+            url_for("api.availabilities")
+            + f"?checkin={checkin_date}"
+            + f"&checkout={checkout_date}"
+            + "&sort=distance"
+            + "&include_distance=true"
+        )
+        distances = [hotel["earth_distance_au"] for hotel in response.get_json()]
+
+        assert response.status_code == 200
+        assert None not in distances
+        assert distances == sorted(distances)
+
+    def test_availabilities_max_distance(self, client, db):
+        """Availabilities endpoint should drop hotels beyond max_distance_au."""
+        response = client.get(
+            url_for("api.availabilities")
+            + f"?checkin={checkin_date}"
+            + f"&checkout={checkout_date}"
+            + "&max_distance_au=0.0001"
+        )
+
+        assert response.status_code == 200
+        assert response.get_json() == []
+        assert "earth_distance_au" not in response.get_data(as_text=True)
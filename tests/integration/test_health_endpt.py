@@ -0,0 +1,15 @@
+from flask import url_for
+
+
+class TestHealth(object):
+    def test_health_reports_pool_stats(self, client, db):
+        """Health endpoint should return 200 and connection pool counters."""
+        response = client.get(url_for("api.health"))
+        json_response = response.get_json()
+
+        assert response.status_code == 200
+        assert json_response["database"] == "ok"
+        pool = json_response["engines"]["primary"]
+        assert pool["pool"] == "QueuePool"
+        assert pool["checkedout"] >= 0
+        assert "overflow" in pool
@@ -1,5 +1,10 @@
+import json
+from datetime import date, timedelta
+
 from flask import url_for
 
+from tests.util import count_queries
+
 
 class TestHotelList(object):
     def test_hotellist_get(self, client, db):
@@ -11,6 +16,19 @@ class TestHotelList(object):
 
         assert response.status_code == 200
 
+    def test_hotellist_get_ndjson(self, client, db):
+        """Hotels endpoint should stream every hotel with room counts as NDJSON."""
+        response = client.get(
+            url_for("api.hotels"), headers={"Accept": "application/x-ndjson"}
+        )
+        hotels = [
+            json.loads(line) for line in response.get_data(as_text=True).splitlines()
+        ]
+
+        assert response.status_code == 200
+        assert len(hotels) == 54
+        assert hotels[0]["total_king_rooms"] == 3
+
     def test_hotellist_create_hotel_valid_input(self, client, db):
         """
         Hotels endpoint should create hotel for vaild input.
@@ -75,6 +93,38 @@ class TestHotelList(object):
         assert "No hotel name provided." in response.get_json()["errors"]["name"]
 
 
+    def test_hotellist_get_constant_query_count(self, client, db):
+        """
+        Hotels endpoint should list hotels with room counts in a constant
+        number of queries as hotels are added.
+        """
+        with count_queries(db.engine) as queries_before:
+            client.get(url_for("api.hotels"))
+
+        data = {
+            "name": "Biggerasteroid",
+            "ephem_data": "some fake ephem data",
+            "established_date": "1779-Jan-01",
+            "proprietor": "Patterson, C.",
+            "astrd_diameter": 95.2,
+            "astrd_surface_composition": "metallic",
+            "total_double_rooms": 2,
+            "total_queen_rooms": 0,
+            "total_king_rooms": 1,
+        }
+        client.post(url_for("api.hotels"), json=data)
+
+        with count_queries(db.engine) as queries_after:
+            response = client.get(url_for("api.hotels"))
+        hotel = [h for h in response.get_json() if h["name"] == "Biggerasteroid"][0]
+
+        # A version lookup for conditional requests, then the page itself
+        assert len(queries_after) == len(queries_before) == 2
+        assert hotel["total_double_rooms"] == 2
+        assert hotel["total_queen_rooms"] == 0
+        assert hotel["total_king_rooms"] == 1
+
+
 class TestHotel(object):
     def test_hotel_get(self, client, db):
         """Hotel endpoint should return hotel data for valid id. """
@@ -83,6 +133,24 @@ class TestHotel(object):
         assert response.status_code == 200
         assert "name" in response.get_json()
 
+    def test_hotel_get_not_modified(self, client, db):
+        """Hotel endpoint should return 304 for a matching ETag or date."""
+        response = client.get(url_for("api.hotel", id=1))
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        response = client.get(
+            url_for("api.hotel", id=1), headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.get_data() == b""
+
+        response = client.get(
+            url_for("api.hotel", id=1), headers={"If-Modified-Since": last_modified}
+        )
+        assert response.status_code == 304
+
     def test_hotel_get_invalid_hotel_id(self, client, db):
         """Hotel endpoint should return hotel data for valid id. """
         response = client.get(url_for("api.hotel", id=3000))
@@ -108,6 +176,29 @@ class TestHotel(object):
         assert response.status_code == 200
         assert response.get_json()["total_double_rooms"] == 10
 
+    def test_hotel_get_modified_after_update(self, client, db):
+        """Hotel endpoint should return 200 and a new ETag after an update."""
+        etag = client.get(url_for("api.hotel", id=1)).headers["ETag"]
+        data = {
+            "name": "1_Ceres",
+            "established_date": "1801-Jan-01",
+            "proprietor": "Piazzi, G.",
+            "astrd_diameter": 939.4,
+            "astrd_surface_composition": "carbonaceous",
+            "total_double_rooms": 11,
+            "total_queen_rooms": 10,
+            "total_king_rooms": 10,
+        }
+        client.put(url_for("api.hotel", id=1), json=data)
+
+        response = client.get(
+            url_for("api.hotel", id=1), headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.get_json()["total_double_rooms"] == 11
+
     def test_hotel_invalid_update_lowering_room_count(self, client, db):
         """Hotel endpoint should return 200 and updated hotel data for valid update."""
         # Change total number of double rooms to 9
@@ -155,3 +246,50 @@ class TestHotel(object):
         response = client.delete(url_for("api.hotel", id=54))
 
         assert response.status_code == 404
+
+
+class TestHotelCalendar(object):
+    first_night = date.today() + timedelta(days=10)
+    calendar = dict(
+        id=2,
+        room_type="king",
+        **{
+            "from": first_night.isoformat(),
+            "to": (first_night + timedelta(days=7)).isoformat(),
+        },
+    )
+
+    def test_hotel_calendar_get(self, client, db):
+        """Calendar endpoint should return one free count per night and room type."""
+        response = client.get(url_for("api.hotel_calendar", **self.calendar))
+        data = json.loads(response.get_data())
+
+        assert response.status_code == 200
+        assert data["dates"][0] == self.first_night.isoformat()
+        assert len(data["dates"]) == 7
+        assert data["free"] == {"king": [3] * 7}
+        assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+    def test_hotel_calendar_not_modified(self, client, db):
+        """Calendar endpoint should return 304 for a matching ETag."""
+        response = client.get(url_for("api.hotel_calendar", **self.calendar))
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            url_for("api.hotel_calendar", **self.calendar),
+            headers={"If-None-Match": etag},
+        )
+        assert response.status_code == 304
+
+    def test_hotel_calendar_invalid_range(self, client, db):
+        """Calendar endpoint should return 400 for an empty range."""
+        calendar = dict(self.calendar, to=self.calendar["from"])
+        response = client.get(url_for("api.hotel_calendar", **calendar))
+
+        assert response.status_code == 400
+
+    def test_hotel_calendar_invalid_hotel_id(self, client, db):
+        """Calendar endpoint should return 404 for a hotel that does not exist."""
+        response = client.get(url_for("api.hotel_calendar", id=3000))
+
+        assert response.status_code == 404
@@ -0,0 +1,109 @@
+import pytest
+from flask import g, url_for
+from sqlalchemy import create_engine, text
+from sqlalchemy_utils import database_exists, create_database
+
+from hotel_api.models import Hotels
+from hotel_api.routing import read_only, use_primary
+from tests.util import hotel_columns
+
+
+@pytest.fixture(scope="module")
+def replica(app, db):
+    """
+    Stand up a second database as the only replica, holding one hotel.
+
+    :param app: Pytest fixture
+    :param db: Pytest fixture
+    :return: Replica database URI
+    """
+    uri = "{0}_replica".format(app.config["SQLALCHEMY_DATABASE_URI"])
+    if not database_exists(uri):
+        create_database(uri)
+    engine = create_engine(uri)
+    engine.execute("CREATE SCHEMA IF NOT EXISTS hotel_api;")
+    db.Model.metadata.drop_all(bind=engine)
+    db.Model.metadata.create_all(bind=engine)
+    engine.execute(
+        Hotels.__table__.insert().values(
+            **hotel_columns("Replicaasteroid", astrd_surface_composition="primitive")
+        )
+    )
+    engine.dispose()
+
+    app.config["SQLALCHEMY_REPLICA_URIS"] = [uri]
+    db.session.remove()
+    yield uri
+
+    app.config["SQLALCHEMY_REPLICA_URIS"] = []
+    db.session.remove()
+    db.router.dispose()
+
+
+class TestReplicaRouting(object):
+    def test_get_reads_from_replica(self, client, db, replica):
+        """Read-only requests should be served from the replica."""
+        response = client.get(url_for("api.hotels"))
+        names = [h["name"] for h in response.get_json()]
+
+        assert response.status_code == 200
+        assert names == ["Replicaasteroid"]
+
+    def test_write_pins_client_to_primary(self, client, db, replica):
+        """Reads right after a successful write should come from the primary."""
+        db.session.remove()
+        with use_primary():
+            hotel = Hotels.get_hotel(1)["fields"]
+        db.session.remove()
+        keys = (
+            "name",
+            "established_date",
+            "proprietor",
+            "astrd_diameter",
+            "astrd_surface_composition",
+            "total_double_rooms",
+            "total_queen_rooms",
+            "total_king_rooms",
+        )
+        response = client.put(
+            url_for("api.hotel", id=1), json={k: hotel[k] for k in keys}
+        )
+
+        assert response.status_code == 200
+        assert "db_pin=" in response.headers["Set-Cookie"]
+
+        db.session.remove()
+        response = client.get(url_for("api.hotels"))
+        names = [h["name"] for h in response.get_json()]
+
+        assert "Replicaasteroid" not in names
+        assert hotel["name"] in names
+
+    def test_raw_sql_reads_primary_unless_read_only(self, db, replica):
+        """Raw SQL may write, so only text() marked read_only goes to replicas."""
+        query = text("select name from hotel_api.hotels order by id")
+        update = text("update hotel_api.hotels set id = id")
+        g.db_replica = replica
+        try:
+            write = db.session.get_bind(clause=update)
+            names = [row[0] for row in db.session.execute(query)]
+            replica_names = [row[0] for row in db.session.execute(read_only(query))]
+        finally:
+            g.db_replica = None
+            db.session.remove()
+
+        assert write is db.engine
+        assert "Replicaasteroid" not in names
+        assert replica_names == ["Replicaasteroid"]
+
+    def test_write_pins_access_token(self, app, db, replica):
+        """Clients without cookies should be pinned by their access token."""
+        with app.test_request_context(method="PUT", headers={"Authorization": "a"}):
+            db.router.pin_writer(app.response_class(status=200))
+        with app.test_request_context(headers={"Authorization": "a"}):
+            pinned = db.router.pinned()
+        with app.test_request_context(headers={"Authorization": "b"}):
+            other = db.router.pinned()
+
+        assert pinned
+        assert not other
@@ -1,3 +1,5 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from flask import url_for
@@ -17,6 +19,33 @@ class TestReservationList(object):
         assert len(response.get_json()) == 3
         assert "uri" in response.get_json()[0]
 
+    def test_reservationlist_get_pages(self, client, db):
+        """Reservation list endpoint should page with an after cursor and limit."""
+        response = client.get(url_for("api.reservations", limit=2))
+
+        assert response.status_code == 200
+        assert len(response.get_json()) == 2
+        assert response.headers["X-Next-Cursor"] == "2"
+        assert 'rel="next"' in response.headers["Link"]
+
+        response = client.get(url_for("api.reservations", after=2, limit=2))
+
+        assert response.status_code == 200
+        assert len(response.get_json()) == 1
+        assert "Link" not in response.headers
+
+    def test_reservationlist_get_ndjson(self, client, db):
+        """Reservation list endpoint should stream every reservation as NDJSON."""
+        response = client.get(
+            url_for("api.reservations"), headers={"Accept": "application/x-ndjson"}
+        )
+        lines = response.get_data(as_text=True).splitlines()
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert len(lines) == 3
+        assert "uri" in json.loads(lines[0])
+
     def test_reservationlist_post_valid_reservation(self, client, db):
         """Reservation list should return 200 and reservation details for vaild reservation."""
         data = {
@@ -89,6 +118,17 @@ class TestReservation(object):
         assert response.status_code == 200
         assert response.get_json()["guest_full_name"] == "Roger Briggs"
 
+    def test_reservation_get_not_modified(self, client, db):
+        """Reservation endpoint should return 304 for a matching ETag."""
+        response = client.get(url_for("api.reservation", id=1))
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            url_for("api.reservation", id=1), headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == 304
+
     def test_reseration_get_invalid_id(self, client, db):
         """Reservation endpoint should return 404 when supplied invalid reservation id."""
         response = client.get(url_for("api.reservation", id=3000))
@@ -139,4 +179,87 @@ class TestReservation(object):
         """Reservation endpoint should return 404 for invalid reservation id."""
         response = client.delete(url_for("api.reservation", id=3000))
 
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404
+
+
+class TestReservationConcurrency(object):
+    def test_parallel_reservations_do_not_oversell(
+        self, app, client, db, hotel_factory
+    ):
+        """Parallel bookings for a one room hotel should only reserve the room once."""
+        hotel = hotel_factory("Tinyasteroid")
+        data = {
+            "checkin_date": checkin_date,
+            "checkout_date": checkout_date,
+            "guest_full_name": "Jim Lately",
+            "customer_user_id": 4,
+            "desired_room_type": "king",
+            "hotel_id": hotel.id,
+        }
+        url = url_for("api.reservations")
+
+        def reserve(_):
+            with app.test_client() as thread_client:
+                return thread_client.post(url, json=data).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            status_codes = list(executor.map(reserve, range(16)))
+
+        assert status_codes.count(201) == 1
+        assert status_codes.count(400) == 15
+
+
+class TestReservationBatch(object):
+    def batch(self, hotel_id, stays):
+        stay = {
+            "checkin_date": checkin_date,
+            "checkout_date": checkout_date,
+            "guest_full_name": "Group Guest",
+            "customer_user_id": 4,
+            "desired_room_type": "king",
+            "hotel_id": hotel_id,
+        }
+        return [dict(stay) for _ in range(stays)]
+
+    def test_reservation_batch_modes(self, client, db, hotel_factory):
+        """
+        A batch larger than the hotel should be rejected as a whole in
+        all_or_nothing mode and partly booked in best_effort mode.
+        """
+        hotel = hotel_factory("Groupasteroid", king=2)
+        url = url_for("api.reservation_batch")
+        reservations = self.batch(hotel.id, 3)
+
+        response = client.post(url, json={"reservations": reservations})
+        statuses = [result["status"] for result in response.get_json()["results"]]
+
+        assert response.status_code == 409
+        assert statuses == ["not_attempted", "not_attempted", "unavailable"]
+
+        response = client.post(
+            url, json={"reservations": reservations, "mode": "best_effort"}
+        )
+        results = response.get_json()["results"]
+
+        assert response.status_code == 200
+        assert response.get_json()["created"] == 2
+        assert [result["status"] for result in results] == [
+            "created",
+            "created",
+            "unavailable",
+        ]
+        assert results[0]["reservation"]["hotel_id"] == hotel.id
+
+    def test_reservation_batch_invalid_item(self, client, db):
+        """An invalid item should reject an all_or_nothing batch."""
+        reservations = self.batch(3, 2)
+        del reservations[1]["guest_full_name"]
+
+        response = client.post(
+            url_for("api.reservation_batch"), json={"reservations": reservations}
+        )
+        results = response.get_json()["results"]
+
+        assert response.status_code == 409
+        assert [result["status"] for result in results] == ["not_attempted", "invalid"]
+        assert results[1]["error"]
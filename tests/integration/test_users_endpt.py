@@ -13,6 +13,19 @@ class TestUserList(object):
         assert "password" not in response.get_json()[0].keys()
         assert "user_name" in response.get_json()[0].keys()
 
+    def test_userlist_get_limit_capped(self, app, client, db):
+        """Users endpoint should never return more than the maximum page size."""
+        max_page_size = app.config["MAX_PAGE_SIZE"]
+        app.config["MAX_PAGE_SIZE"] = 2
+        try:
+            response = client.get(url_for("api.users", limit=1000))
+        finally:
+            app.config["MAX_PAGE_SIZE"] = max_page_size
+
+        assert response.status_code == 200
+        assert len(response.get_json()) == 2
+        assert "X-Next-Cursor" in response.headers
+
     def test_userlist_post_new_valid_user(self, client, db):
         """
         Users endpoint should return 201 and user data (excluding password)
@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta
+
+from hotel_api.availability import (
+    search_flexible,
+    search_hotels,
+    search_hotels_cached,
+)
+from hotel_api.extensions import availability_cache
+from hotel_api.models import Hotels, InventoryVersions, Reservations
+
+checkin = date.today()
+checkout = checkin + timedelta(days=5)
+
+
+class TestSearchHotels(object):
+    def test_search_hotels_returns_hotels(self, db):
+        """Search should return hotels with inventory for every night of the stay."""
+        hotels = search_hotels(checkin, checkout).all()
+
+        assert len(hotels) > 0
+        assert all(hasattr(hotel, "name") for hotel in hotels)
+
+    def test_search_hotels_filters_names(self, db):
+        """Search should only return hotels with the given names."""
+        hotels = search_hotels(checkin, checkout, names=["1_Ceres", "8_Flora"]).all()
+
+        assert {hotel.name for hotel in hotels} <= {"1_Ceres", "8_Flora"}
+
+    def test_search_hotels_filters_surface_types(self, db):
+        """Search should only return hotels with the given surface types."""
+        hotels = search_hotels(checkin, checkout, surface_types=["metallic"]).all()
+
+        assert len(hotels) > 0
+        assert all(hotel.astrd_surface_composition == "metallic" for hotel in hotels)
+
+    def test_search_hotels_without_inventory(self, db):
+        """Search should return no hotels for dates without inventory."""
+        hotels = search_hotels(date(2020, 9, 1), date(2020, 9, 5)).all()
+
+        assert hotels == []
+
+
+class TestSearchFlexible(object):
+    def test_search_flexible_matches_exact_searches(self, db):
+        """Each hotel's check-in dates should be those an exact search finds it on."""
+        window_end = checkin + timedelta(days=10)
+        hotels = search_flexible(checkin, window_end, 3, room_types=["queen"])
+
+        expected = {}
+        for offset in range(8):
+            first_night = checkin + timedelta(days=offset)
+            stay = (first_night, first_night + timedelta(days=3))
+            for hotel in search_hotels(*stay, room_types=["queen"]):
+                expected.setdefault(hotel.id, []).append(first_night)
+
+        assert len(hotels) > 0
+        assert {h["id"]: h["checkin_dates"] for h in hotels} == expected
+
+    def test_search_flexible_without_inventory(self, db):
+        """Flexible search should return no hotels for a window without inventory."""
+        assert search_flexible(date(2020, 9, 1), date(2020, 9, 30), 4) == []
+
+
+class TestSearchHotelsCached(object):
+    def test_cached_search_invalidated_by_booking(self, db, hotel_factory):
+        """A cached search should be recomputed once its last room is booked."""
+        hotel = hotel_factory("Cacheasteroid", astrd_surface_composition="enstatite")
+        search = dict(
+            checkin=checkin,
+            checkout=checkout,
+            room_types=["king"],
+            names=["Cacheasteroid"],
+        )
+        availability_cache.clear()
+
+        first = search_hotels_cached(**search)
+        second = search_hotels_cached(**search)
+
+        assert [h["name"] for h in first] == ["Cacheasteroid"]
+        assert second is first
+        assert availability_cache.stats()["hits"] == 1
+
+        Reservations(
+            checkin_date=checkin,
+            checkout_date=checkout,
+            guest_full_name="Cache Guest",
+            customer_user_id=2,
+            desired_room_type="king",
+            hotel_id=hotel.id,
+            is_cancelled=False,
+            is_completed=False,
+            created_date=datetime.now(),
+            last_modified_date=datetime.now(),
+        ).add()
+
+        assert search_hotels_cached(**search) == []
+        assert availability_cache.stats()["misses"] == 2
+
+    def test_cached_search_invalidated_by_rename(self, db, hotel_factory):
+        """A hotel renamed into a cached name filter should be found next time."""
+        renamed_out = hotel_factory("Swapasteroid_X")
+        renamed_in = hotel_factory("Swapasteroid_B")
+        InventoryVersions.bump([renamed_out.id])
+        db.session.commit()
+        search = dict(checkin=checkin, checkout=checkout, names=["Swapasteroid_X"])
+        availability_cache.clear()
+
+        before = search_hotels_cached(**search)
+        # Each rename bumps its hotel once, so the sum of the versions of the
+        #  hotels named Swapasteroid_X is the same before and after.
+        for hotel_id, name in (
+            (renamed_out.id, "Swapasteroid_Y"),
+            (renamed_in.id, "Swapasteroid_X"),
+        ):
+            Hotels.query.filter_by(id=hotel_id).update({"name": name})
+            InventoryVersions.bump([hotel_id])
+        db.session.commit()
+        after = search_hotels_cached(**search)
+
+        assert [h["id"] for h in before] == [renamed_out.id]
+        assert [h["id"] for h in after] == [renamed_in.id]
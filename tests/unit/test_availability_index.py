@@ -0,0 +1,53 @@
+from datetime import date, datetime, timedelta
+
+from hotel_api.availability import search_hotels
+from hotel_api.availability_index import AvailabilityIndex
+from hotel_api.models import Reservations
+
+checkin = date.today()
+checkout = checkin + timedelta(days=5)
+
+
+class TestAvailabilityIndex(object):
+    def test_index_matches_sql_search(self, app, db):
+        """The index should return the same hotels as the SQL search."""
+        index = AvailabilityIndex(app)
+        search = dict(room_types=["king"], surface_types=["metallic"])
+
+        hotels = index.search(checkin, checkout, **search)
+
+        assert [h["id"] for h in hotels] == [
+            hotel.id for hotel in search_hotels(checkin, checkout, **search)
+        ]
+
+    def test_index_outside_window(self, app, db):
+        """Stays the index does not cover should be left to the database."""
+        index = AvailabilityIndex(app)
+
+        assert index.search(date(2020, 9, 1), date(2020, 9, 5)) is None
+
+    def test_index_refreshed_after_booking(self, app, db, hotel_factory):
+        """A booked out hotel should drop out of the index once it refreshes."""
+        hotel = hotel_factory("Indexasteroid", astrd_surface_composition="enstatite")
+        index = AvailabilityIndex(app)
+        search = dict(room_types=["king"], names=["Indexasteroid"])
+
+        assert [h["name"] for h in index.search(checkin, checkout, **search)] == [
+            "Indexasteroid"
+        ]
+
+        Reservations(
+            checkin_date=checkin,
+            checkout_date=checkout,
+            guest_full_name="Index Guest",
+            customer_user_id=2,
+            desired_room_type="king",
+            hotel_id=hotel.id,
+            is_cancelled=False,
+            is_completed=False,
+            created_date=datetime.now(),
+            last_modified_date=datetime.now(),
+        ).add()
+        index.refresh()
+
+        assert index.search(checkin, checkout, **search) == []
@@ -0,0 +1,27 @@
+import time
+
+from hotel_api.models import BlacklistedTokens
+from hotel_api.token_cache import token_digest
+
+
+class TestBlacklistedTokensModel(object):
+    def test_blacklisted_token_stored_by_hash(self, db):
+        """A blacklisted token should be stored and found by its digest."""
+        token = BlacklistedTokens("some.fake.token", time.time() + 60)
+        token.add()
+
+        assert token.token_hash == token_digest("some.fake.token")
+        assert BlacklistedTokens.check_blacklist("some.fake.token")
+
+    def test_purge_expired_deletes_only_expired(self, db):
+        """Purging should delete every expired token and keep unexpired ones."""
+        for n in range(3):
+            BlacklistedTokens(f"expired.fake.token{n}", time.time() - 60).add()
+        BlacklistedTokens("unexpired.fake.token", time.time() + 60).add()
+
+        purged = BlacklistedTokens.purge_expired(batch_size=2)
+
+        assert purged >= 3
+        for n in range(3):
+            assert not BlacklistedTokens.check_blacklist(f"expired.fake.token{n}")
+        assert BlacklistedTokens.check_blacklist("unexpired.fake.token")
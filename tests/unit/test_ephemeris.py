@@ -0,0 +1,44 @@
+from datetime import date
+
+from hotel_api.availability import with_distances
+from hotel_api.ephemeris import Ephemeris
+from lib.astrd_data.astrd_data import astrd_data
+
+ceres = astrd_data["1 Ceres"]["ephem_data"]
+day = date(2021, 3, 1)
+
+
+class TestEphemeris(object):
+    def test_earth_distance_memoized(self):
+        """Distances should be computed once per ephem_data and date."""
+        ephemeris = Ephemeris()
+        ephemeris.max_size = 10
+
+        first = ephemeris.earth_distance(ceres, day)
+        second = ephemeris.earth_distance(ceres, day)
+
+        assert 1.5 < first < 4.0
+        assert second == first
+        assert (ephemeris.hits, ephemeris.misses) == (1, 1)
+        assert ephemeris.stats()["bodies"] == 1
+
+    def test_earth_distance_invalid_ephem_data(self):
+        """Lines ephem cannot parse should have no distance."""
+        assert Ephemeris().earth_distance("some fake ephem data", day) is None
+
+    def test_with_distances_sorts_and_filters(self, app, db):
+        """Hotels should be sorted nearest first, without distance last."""
+        hotels = [
+            {"id": id, "ephem_data": astrd_data[name]["ephem_data"]}
+            for id, name in enumerate(astrd_data)
+        ] + [{"id": -1, "ephem_data": "some fake ephem data"}]
+
+        nearest = with_distances(hotels, day, sort_by_distance=True)
+        distances = [hotel["earth_distance_au"] for hotel in nearest]
+        within = with_distances(hotels, day, max_distance_au=distances[5])
+
+        assert distances[:-1] == sorted(distances[:-1])
+        assert nearest[-1]["id"] == -1
+        assert "earth_distance_au" not in hotels[0]
+        assert len(within) >= 6
+        assert all(hotel["earth_distance_au"] <= distances[5] for hotel in within)
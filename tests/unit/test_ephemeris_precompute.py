@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+
+from hotel_api.availability import with_distances
+from hotel_api.ephemeris import Ephemeris
+from hotel_api.ephemeris_precompute import compute_positions, precompute_positions
+from hotel_api.extensions import db as _db, ephemeris
+from hotel_api.models import HotelEphemeris, HotelEphemerisSources, Hotels
+from lib.astrd_data.astrd_data import astrd_data
+
+ceres = astrd_data["1 Ceres"]["ephem_data"]
+juno = astrd_data["3 Juno"]["ephem_data"]
+today = date.today()
+
+
+class TestComputePositions(object):
+    def test_compute_positions(self):
+        """Workers should return a CSV row per hotel and day, matching ephem."""
+        rows = compute_positions(
+            [(1, ceres, today, 3), (2, "some fake ephem data", today, 3)]
+        ).splitlines()
+        hotel_id, day, *_, earth_distance = rows[0].split(",")
+
+        assert len(rows) == 3
+        assert (hotel_id, day) == ("1", today.isoformat())
+        assert float(earth_distance) == Ephemeris().earth_distance(ceres, today)
+
+
+class TestPrecomputePositions(object):
+    def test_precompute_incremental(self, db, hotel_factory):
+        """Only new hotels and hotels whose ephem_data changed are computed."""
+        hotel = hotel_factory("Ephemerisasteroid", ephem_data=ceres)
+        hotel_id = hotel.id
+        days = HotelEphemeris.query.filter_by(hotel_id=hotel_id)
+
+        first = precompute_positions(months=1, workers=2, chunk_size=10)
+        computed = days.count()
+        second = precompute_positions(months=1, workers=2)
+        Hotels.query.get(hotel_id).ephem_data = juno
+        _db.session.commit()
+        third = precompute_positions(months=1, workers=2)
+
+        source = HotelEphemerisSources.query.get(hotel_id)
+        distances = HotelEphemeris.earth_distances(
+            [(hotel_id, ceres), (hotel_id, juno)], today
+        )
+
+        assert first["computed"] == Hotels.query.count()
+        assert computed == (source.computed_through - today).days + 1
+        assert second["computed"] == 0
+        assert (third["computed"], third["changed"]) == (1, 1)
+        assert days.count() == computed
+        assert list(distances) == [juno]
+        assert distances[juno] == pytest.approx(Ephemeris().earth_distance(juno, today))
+
+    def test_with_distances_uses_precomputed(self, db, hotel_factory):
+        """Precomputed distances should only be used for their own ephem_data."""
+        hotel = hotel_factory("Nearasteroid", ephem_data=ceres)
+        precompute_positions(months=1, workers=1)
+        ephemeris.clear()
+
+        # The second dict is stale: it holds other ephem_data for the same id
+        hotels = with_distances(
+            [hotel.serialize(), dict(hotel.serialize(), ephem_data=juno)], today
+        )
+        stats = ephemeris.stats()
+
+        assert hotels[0]["earth_distance_au"] == pytest.approx(
+            Ephemeris().earth_distance(ceres, today)
+        )
+        assert hotels[1]["earth_distance_au"] == Ephemeris().earth_distance(juno, today)
+        assert (stats["hits"], stats["misses"]) == (1, 1)
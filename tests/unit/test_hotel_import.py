@@ -0,0 +1,66 @@
+import json
+from datetime import date
+
+from hotel_api.hotel_import import import_hotels
+from hotel_api.models import Hotels, InventoryVersions, RoomInventory
+
+csv_lines = [
+    "name,established_date,proprietor,astrd_diameter,astrd_surface_composition,"
+    "ephem_data,total_double_rooms,total_queen_rooms,total_king_rooms\n",
+    'Importasteroid_1,1801-Jan-01,"Patterson, C.",7.8,metallic,'
+    '"fake, ephem data",1,2,3\n',
+    "Importasteroid_2,1801-Jan-01,,7.8,enstatite,fake ephem data,0,0,2\n",
+    "Importasteroid_1,1801-Jan-01,,7.8,metallic,fake ephem data,1,1,1\n",
+    "Importasteroid_3,1801-Jan-01,,7.8,metallic,fake ephem data,1,-1,1\n",
+]
+
+
+class TestImportHotels(object):
+    def test_import_hotels_csv(self, db):
+        """Hotels should be imported with rooms and inventory, skipping bad rows."""
+        chunks = []
+        stats = import_hotels(
+            csv_lines, "csv", chunk_size=2, inv_months=1, progress=chunks.append
+        )
+        hotel = Hotels.query.filter_by(name="Importasteroid_1").one()
+        nights = RoomInventory.query.filter(
+            RoomInventory.hotel_id == hotel.id,
+            RoomInventory.room_type == "king",
+            RoomInventory.date == date.today(),
+        ).one()
+
+        assert len(chunks) == 2
+        assert stats["read"] == 4
+        assert stats["imported"] == 2
+        assert stats["skipped"] == 1
+        assert stats["invalid"] == 1
+        assert stats["errors"][0]["line"] == 5
+        assert hotel.proprietor == "Patterson, C."
+        assert hotel.ephem_data == "fake, ephem data"
+        assert hotel.get_room_counts() == {
+            "total_double_rooms": 1,
+            "total_queen_rooms": 2,
+            "total_king_rooms": 3,
+        }
+        assert nights.max_rooms_available == 3
+        assert InventoryVersions.query.get(hotel.id) is not None
+
+    def test_import_hotels_jsonl(self, db):
+        """Hotels in JSONL should be imported once, even when imported again."""
+        row = dict(
+            name="Importasteroid_4",
+            established_date="1801-Jan-01",
+            astrd_diameter=7.8,
+            astrd_surface_composition="primitive",
+            ephem_data="fake ephem data",
+            total_double_rooms=1,
+            total_queen_rooms=1,
+            total_king_rooms=1,
+        )
+        lines = [json.dumps(row) + "\n", "not json\n"]
+
+        first = import_hotels(lines, "jsonl", inv_months=1)
+        second = import_hotels(lines, "jsonl", inv_months=1)
+
+        assert (first["imported"], first["invalid"]) == (1, 1)
+        assert (second["imported"], second["skipped"]) == (0, 1)
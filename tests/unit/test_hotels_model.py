@@ -0,0 +1,27 @@
+import tracemalloc
+
+from hotel_api.models import Hotels, Rooms, RoomInventory
+
+
+class TestDeleteHotel(object):
+    def test_delete_hotel_memory_ceiling(self, db, hotel_factory):
+        """Deleting a hotel with a year of inventory should not load its rows."""
+        hotel = hotel_factory(
+            "Deletableasteroid",
+            double=50,
+            queen=50,
+            king=50,
+            inv_months=12,
+            astrd_surface_composition="carbonaceous",
+        )
+        hotel_id = hotel.id
+        assert RoomInventory.query.filter_by(hotel_id=hotel_id).count() >= 365 * 3
+
+        tracemalloc.start()
+        Hotels.delete_hotel(hotel_id)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert peak < 256 * 1024
+        assert Rooms.query.filter_by(hotel_id=hotel_id).count() == 0
+        assert RoomInventory.query.filter_by(hotel_id=hotel_id).count() == 0
@@ -0,0 +1,143 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.sql import and_
+
+from hotel_api.availability import search_hotels
+from hotel_api.models import RoomInventory
+
+checkin = date.today()
+checkout = checkin + timedelta(days=5)
+
+
+def explain(db, statement):
+    """Return the query plan for a statement with sequential scans disabled."""
+    compiled = statement.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as connection:
+        connection.execute("SET LOCAL enable_seqscan = off")
+        rows = connection.execute("EXPLAIN " + str(compiled), compiled.params)
+        return "\n".join(row[0] for row in rows)
+
+
+class TestRoomInventoryQueryPlans(object):
+    def test_check_available_uses_index(self, db):
+        """Inventory lookups for a stay should not scan the whole table."""
+        query = db.session.query(RoomInventory.date).filter(
+            *RoomInventory.stay_filter(1, "king", checkin, checkout)
+        )
+        plan = explain(db, query.statement)
+
+        assert "Seq Scan on room_inventory" not in plan
+
+    def test_update_inventory_uses_index(self, db):
+        """Reserving inventory for a stay should not scan the whole table."""
+        table = RoomInventory.__table__
+        stmt = (
+            table.update()
+            .where(and_(*RoomInventory.stay_filter(1, "king", checkin, checkout)))
+            .values(rooms_reserved=table.c.rooms_reserved + 1)
+        )
+        plan = explain(db, stmt)
+
+        assert "Seq Scan on room_inventory" not in plan
+
+    def test_bulk_update_inventory_uses_index(self, db):
+        """Updating a hotel's capacity should not scan the whole table."""
+        table = RoomInventory.__table__
+        stmt = (
+            table.update()
+            .where(and_(table.c.hotel_id == 1, table.c.room_type == "king"))
+            .values(max_rooms_available=10)
+        )
+        plan = explain(db, stmt)
+
+        assert "Seq Scan on room_inventory" not in plan
+
+    def test_search_hotels_uses_index(self, db):
+        """Availability searches should not scan the whole table."""
+        query = search_hotels(checkin, checkout, room_types=["king"])
+        plan = explain(db, query.statement)
+
+        assert "Seq Scan on room_inventory" not in plan
+
+
+class TestBulkAddInventory(object):
+    def test_bulk_add_inventory_spans_chunks(self, app, db):
+        """Inventory generated across several chunks should cover each night once."""
+        start = date(2100, 1, 1)
+        end = start + timedelta(days=30)
+        chunk_days = app.config["INVENTORY_CHUNK_DAYS"]
+        app.config["INVENTORY_CHUNK_DAYS"] = 7
+        try:
+            RoomInventory.bulk_add_inventory(
+                hotel_id=1,
+                max_double_capactiy=1,
+                max_queen_capactiy=2,
+                max_king_capacity=3,
+                start_date=start,
+                end_date=end,
+            )
+            rows = (
+                db.session.query(
+                    RoomInventory.room_type,
+                    func.count(RoomInventory.date),
+                    func.count(func.distinct(RoomInventory.date)),
+                    func.min(RoomInventory.date),
+                    func.max(RoomInventory.date),
+                    func.max(RoomInventory.max_rooms_available),
+                )
+                .filter(RoomInventory.hotel_id == 1, RoomInventory.date >= start)
+                .group_by(RoomInventory.room_type)
+                .all()
+            )
+        finally:
+            db.session.rollback()
+            app.config["INVENTORY_CHUNK_DAYS"] = chunk_days
+
+        assert {r[0]: r[5] for r in rows} == {"double": 1, "queen": 2, "king": 3}
+        for _, nights, distinct_nights, first, last, _ in rows:
+            assert nights == distinct_nights == 30
+            assert first.date() == start
+            assert last.date() == end - timedelta(days=1)
+
+
+class TestExtendHorizon(object):
+    def test_extend_horizon_appends_missing_nights(self, db, hotel_factory):
+        """A hotel should be extended to the horizon exactly once."""
+        hotel = hotel_factory("Horizonasteroid", double=1, queen=1, king=1)
+        nights = db.session.query(
+            RoomInventory.room_type,
+            func.count(RoomInventory.id),
+            func.min(RoomInventory.date),
+            func.max(RoomInventory.date),
+        ).group_by(RoomInventory.room_type)
+        last_night = (
+            db.session.query(func.max(RoomInventory.date))
+            .filter(RoomInventory.hotel_id == hotel.id)
+            .scalar()
+        )
+        # end_date is exclusive, so ten nights are added per room type
+        end_date = last_night.date() + timedelta(days=11)
+        started = datetime.now()
+        try:
+            added = RoomInventory.extend_horizon(end_date=end_date, batch_size=10)
+            readded = RoomInventory.extend_horizon(end_date=end_date, batch_size=10)
+            extended = nights.filter(
+                RoomInventory.hotel_id == hotel.id, RoomInventory.date > last_night
+            ).all()
+        finally:
+            # Every hotel ending before end_date was extended, not only this one
+            db.session.rollback()
+            db.engine.execute(
+                RoomInventory.__table__.delete().where(
+                    RoomInventory.created_date >= started
+                )
+            )
+
+        assert added >= 30
+        assert readded == 0
+        assert {r[0] for r in extended} == {"double", "queen", "king"}
+        for _, count, first, last in extended:
+            assert count == 10
+            assert first == last_night + timedelta(days=1)
+            assert last.date() == end_date - timedelta(days=1)
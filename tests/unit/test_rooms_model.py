@@ -0,0 +1,19 @@
+from hotel_api.models import Hotels, Rooms
+
+
+class TestBulkAddRooms(object):
+    def test_bulk_add_rooms_adds_each_type(self, db):
+        """Rooms should be added per type in a single statement."""
+        hotel = Hotels.query.get(1)
+        before = hotel.get_room_counts()
+        try:
+            Rooms.bulk_add_rooms(
+                hotel_id=1, double_rooms=2, queen_rooms=0, king_rooms=700
+            )
+            after = hotel.get_room_counts()
+        finally:
+            db.session.rollback()
+
+        assert after["total_double_rooms"] == before["total_double_rooms"] + 2
+        assert after["total_queen_rooms"] == before["total_queen_rooms"]
+        assert after["total_king_rooms"] == before["total_king_rooms"] + 700
@@ -0,0 +1,91 @@
+import time
+
+from hotel_api.extensions import token_blacklist
+from hotel_api.models import Users, BlacklistedTokens
+from hotel_api.token_cache import TokenCache
+from tests.util import count_queries
+
+
+class TestTokenCache(object):
+    def test_token_cache_evicts_least_recently_used(self):
+        """A full cache should evict the least recently used token."""
+        cache = TokenCache()
+        cache.max_size = 2
+        exp = time.time() + 60
+        cache.set("a", {"exp": exp})
+        cache.set("b", {"exp": exp})
+        cache.get("a")
+        cache.set("c", {"exp": exp})
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_token_cache_expires_entries(self):
+        """A cached token should not be returned once it has expired."""
+        cache = TokenCache()
+        cache.max_size = 2
+        cache.set("a", {"exp": time.time() - 1})
+
+        assert cache.get("a") is None
+
+
+class TestTokenBlacklist(object):
+    def test_decode_cached_token_skips_database(self, db, user):
+        """Decoding a cached, unrevoked token should not query the database."""
+        refresh_seconds = token_blacklist.refresh_seconds
+        token_blacklist.refresh_seconds = 3600
+        try:
+            access_token = user.encode_access_token()
+            Users.decode_access_token(access_token)
+            with count_queries(db.engine) as queries:
+                user_dict = Users.decode_access_token(access_token)
+        finally:
+            token_blacklist.refresh_seconds = refresh_seconds
+
+        assert user_dict["status"] == "Success"
+        assert queries == []
+
+    def test_logout_blacklists_cached_token(self, db):
+        """A token should be rejected as soon as it is blacklisted in this process."""
+        # Use a seeded user so the revoked token can't collide with tokens
+        #  issued to the test user within the same second.
+        user = Users.query.filter(Users.user_name == "miguel_grinberg").first()
+        refresh_seconds = token_blacklist.refresh_seconds
+        token_blacklist.refresh_seconds = 3600
+        try:
+            access_token = user.encode_access_token()
+            user_dict = Users.decode_access_token(access_token)
+            BlacklistedTokens(access_token, user_dict["expires_at"]).add()
+            user_dict = Users.decode_access_token(access_token)
+        finally:
+            token_blacklist.refresh_seconds = refresh_seconds
+
+        assert user_dict["status"] == "Failed"
+        assert user_dict["message"] == "Token blacklisted. Please log in again."
+
+    def test_rebuild_finds_rows_committed_out_of_order(self, db):
+        """A row below the incremental id cursor should be found by a rebuild."""
+        refresh_seconds = token_blacklist.refresh_seconds
+        rebuild_seconds = token_blacklist.rebuild_seconds
+        blacklisted = BlacklistedTokens("out-of-order-token", time.time() + 60)
+        try:
+            token_blacklist.refresh_seconds = 3600
+            token_blacklist.rebuild_seconds = 3600
+            token_blacklist.refresh()
+            # As if a higher id had been committed and read before this row
+            token_blacklist._last_id += 1000
+            db.session.add(blacklisted)
+            db.session.commit()
+            token_blacklist.refresh()
+            missed = not token_blacklist.contains(blacklisted.token_hash)
+            token_blacklist.rebuild_seconds = 0
+            token_blacklist.refresh()
+            found = token_blacklist.contains(blacklisted.token_hash)
+        finally:
+            token_blacklist.refresh_seconds = refresh_seconds
+            token_blacklist.rebuild_seconds = rebuild_seconds
+            token_blacklist.clear()
+
+        assert missed
+        assert found
@@ -1,8 +1,14 @@
 import time
+from datetime import date, datetime, timedelta
 
+import pytest
 import werkzeug
+from werkzeug.exceptions import ServiceUnavailable
 
-from hotel_api.models import Users
+from hotel_api.extensions import password_hasher
+from hotel_api.models import Users, Reservations, RoomInventory
+from hotel_api.passwords import PasswordHasher
+from tests.util import PASSWORD
 
 
 class TestUsersModel(object):
@@ -27,3 +33,87 @@ class TestUsersModel(object):
 
         assert token["status"] == "Failed"
         assert token["message"] == "Access token expired. Please log in again."
+
+    def test_check_password_rehashes_on_cost_change(self, user):
+        log_rounds = password_hasher.log_rounds
+        password_hasher.log_rounds = log_rounds + 1
+        try:
+            assert user.check_password(PASSWORD)
+            assert password_hasher.rounds(user.password) == log_rounds + 1
+        finally:
+            password_hasher.log_rounds = log_rounds
+
+    def test_check_password_wrong_password_not_rehashed(self, user):
+        pw_hash = user.password
+        log_rounds = password_hasher.log_rounds
+        password_hasher.log_rounds = log_rounds + 1
+        try:
+            assert not user.check_password("wrongpassword")
+        finally:
+            password_hasher.log_rounds = log_rounds
+
+        assert user.password == pw_hash
+
+    def test_password_check_refused_when_slots_busy(self, app):
+        """A check that cannot get a hashing slot in time should get a 503."""
+        hasher = PasswordHasher(password_hasher.bcrypt)
+        hasher.init_app(app)
+        hasher.queue_timeout = 0.01
+        pw_hash = hasher.generate_password_hash(PASSWORD)
+        slots = [hasher._slots.acquire() for _ in range(app.config["BCRYPT_POOL_SIZE"])]
+        try:
+            with pytest.raises(ServiceUnavailable):
+                hasher.check_password_hash(pw_hash, PASSWORD)
+        finally:
+            for _ in slots:
+                hasher._slots.release()
+
+        assert hasher.check_password_hash(pw_hash, PASSWORD)
+
+
+class TestUsersDeactivation(object):
+    def test_delete_cancels_reservations_and_releases_inventory(self, db):
+        """Deactivating a user should cancel open stays and free their nights."""
+        user = Users(
+            user_name="deactivated_user",
+            email="deactivated_user@email.com",
+            password=PASSWORD,
+        )
+        user.add()
+        checkin = date.today() + timedelta(days=10)
+        stays = [(checkin, 3), (checkin + timedelta(days=1), 3)]
+
+        def reserved():
+            return {
+                row.date.date(): row.rooms_reserved
+                for row in RoomInventory.query.filter(
+                    *RoomInventory.stay_filter(
+                        1, "queen", checkin, checkin + timedelta(days=4)
+                    )
+                )
+            }
+
+        before = reserved()
+        for checkin_date, nights in stays:
+            Reservations(
+                checkin_date=checkin_date,
+                checkout_date=checkin_date + timedelta(days=nights),
+                guest_full_name="Deactivated User",
+                customer_user_id=user.id,
+                desired_room_type="queen",
+                hotel_id=1,
+                is_cancelled=False,
+                is_completed=False,
+                created_date=datetime.now(),
+                last_modified_date=datetime.now(),
+            ).add()
+        assert reserved() != before
+
+        user.delete()
+
+        assert user.is_deactivated
+        assert reserved() == before
+        assert all(
+            reservation.is_cancelled
+            for reservation in Reservations.query.filter_by(customer_user_id=user.id)
+        )
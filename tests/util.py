@@ -1,10 +1,29 @@
+from contextlib import contextmanager
+from datetime import datetime
+
 from flask import url_for
+from sqlalchemy import event
 
 USER_NAME = "test_user"
 EMAIL = "test_user@email.com"
 PASSWORD = "test1234"
 
 
+def hotel_columns(name, **columns):
+    """Return the columns of a test hotel, defaulting those not given."""
+    defaults = dict(
+        name=name,
+        ephem_data="some fake ephem data",
+        established_date="1801-Jan-01",
+        proprietor="Patterson, C.",
+        astrd_diameter=7.8,
+        astrd_surface_composition="metallic",
+        created_date=datetime.now(),
+        last_modified_date=datetime.now(),
+    )
+    return dict(defaults, **columns)
+
+
 def register_user(client, user_name, email, password):
     data = dict(user_name=user_name, email=email, password=password)
     return client.post(url_for("api.auth_register"), json=data)
@@ -29,3 +48,18 @@ def logout_user(client, access_token, user_name, email, password):
         json=data,
         headers={"Authorization": f"Bearer {access_token}"},
     )
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect every SQL statement executed on engine inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)